@@ -0,0 +1,161 @@
+import itertools
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from tunings import normalize_notes
+
+
+# Job file keys, every one optional:
+#   "format":  "pdf", "svg" or "png" for the per-job sheets (default "pdf")
+#   "tunings": {"Standard": ["E", "B", "G", "D", "A", "E"], ...}
+#   "scales":  {"C Major": ["C", "D", "E", "F", "G", "A", "B"], ...}
+#   "frets":   a fret count or a list of them (default 12)
+#   "strings": string count for the cross-product jobs (default: length of each tuning)
+#   "jobs":    extra explicit jobs, each {"name", "tuning", "notes", "frets", "strings"}
+# Every tuning x scale x frets combination becomes one sheet.
+
+
+def _is_count(value):
+   # bool is an int too, but true isn't a fret count
+   return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def _named_note_lists(spec, key, job_file):
+   """spec[key] checked to be {"Name": [notes]}"""
+   named = spec.get(key, {})
+   if not isinstance(named, dict) or not all(isinstance(notes, list) for notes in named.values()):
+       raise ValueError(f"\"{key}\" in {job_file} should map names to lists of notes")
+   return named
+
+
+def load_jobs(job_file):
+   """Read a job file and expand it into a list of job dicts"""
+   with open(job_file, encoding="utf-8") as f:
+       spec = json.load(f)
+   if not isinstance(spec, dict):
+       raise ValueError(f"{job_file} should hold a JSON object")
+
+   output_format = spec.get("format", "pdf")
+   if not isinstance(output_format, str) or output_format.lower() not in ("pdf", "svg", "png"):
+       raise ValueError(f"Unsupported format in {job_file}: {output_format}")
+   output_format = output_format.lower()
+   frets = spec.get("frets", 12)
+   fret_counts = frets if isinstance(frets, list) else [frets]
+   if not fret_counts or not all(_is_count(count) for count in fret_counts):
+       raise ValueError(f"\"frets\" in {job_file} should be a fret count or a list of them")
+   if "strings" in spec and not _is_count(spec["strings"]):
+       raise ValueError(f"\"strings\" in {job_file} should be a string count")
+
+   jobs = []
+   tunings = _named_note_lists(spec, "tunings", job_file)
+   scales = _named_note_lists(spec, "scales", job_file)
+   for (tuning_name, tuning), (scale_name, notes), fret_count in itertools.product(
+           tunings.items(), scales.items(), fret_counts):
+       jobs.append({
+           "name": f"{scale_name} - {tuning_name} - {fret_count} frets",
+           "tuning": tuning,
+           "notes": notes,
+           "frets": fret_count,
+           "strings": spec.get("strings", len(tuning)),
+       })
+   explicit_jobs = spec.get("jobs", [])
+   if not isinstance(explicit_jobs, list):
+       raise ValueError(f"\"jobs\" in {job_file} should be a list of jobs")
+   for job in explicit_jobs:
+       if not isinstance(job, dict):
+           raise ValueError(f"Job in {job_file} should be an object: {job}")
+       job = dict(job)
+       if "tuning" not in job:
+           raise ValueError(f"Job without a tuning in {job_file}: {job}")
+       job.setdefault("notes", [])
+       job.setdefault("frets", fret_counts[0])
+       if not isinstance(job["tuning"], list) or not isinstance(job["notes"], list):
+           raise ValueError(f"Job in {job_file} should list its tuning and notes: {job}")
+       job.setdefault("strings", len(job["tuning"]))
+       if not _is_count(job["frets"]) or not _is_count(job["strings"]):
+           raise ValueError(f"Job in {job_file} has a bad fret or string count: {job}")
+       job.setdefault("name", " ".join(map(str, job["notes"])) or "Fretboard")
+       if not isinstance(job["name"], str):
+           raise ValueError(f"Job in {job_file} should have a text name: {job}")
+       jobs.append(job)
+
+   for job in jobs:
+       # Flat spellings become the sharps the fretboard uses; anything else fails before rendering
+       for key in ("tuning", "notes"):
+           try:
+               job[key] = normalize_notes(job[key])
+           except ValueError as e:
+               raise ValueError(f"Job '{job['name']}' in {job_file}: {e}") from None
+       job["format"] = output_format
+   return jobs
+
+
+def job_file_name(job, index):
+   slug = re.sub(r"[^A-Za-z0-9#]+", "_", job["name"]).strip("_").replace("#", "sharp")
+   return f"{index:03d}_{slug}.{job['format']}"
+
+
+def _ensure_app():
+   """Offscreen QApplication for rendering without a display"""
+   os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+   from PySide6.QtWidgets import QApplication
+   return QApplication.instance() or QApplication([])
+
+
+def job_snapshot(job):
+   """Apply a job to a fretboard exactly like the GUI would and snapshot it"""
+   from main import PaintedFretboard
+
+   board = PaintedFretboard()
+   with board.batch_update():
+       board.set_dimensions(job["strings"], job["frets"])
+       for string_idx, note in enumerate(job["tuning"][:board.string_count]):
+           board.update_tuning(string_idx, note)
+       board.set_highlighted_notes(job["notes"])
+   snapshot = board.snapshot()
+   board.deleteLater()
+   return snapshot
+
+
+def render_job(job, output_dir):
+   """Render one job to its own file; runs inside a pool worker"""
+   from export import export_snapshot
+
+   _ensure_app()
+   snapshot = job_snapshot(job)
+   file_name = os.path.join(output_dir, job["file_name"])
+   export_snapshot(snapshot, file_name, job["name"])
+   return file_name, snapshot
+
+
+def run_batch(job_file, output_dir="sheets", merge=None, workers=None):
+   """Render every job of job_file into output_dir, optionally merging all sheets into one PDF"""
+   jobs = load_jobs(job_file)
+   os.makedirs(output_dir, exist_ok=True)
+   for index, job in enumerate(jobs):
+       job["file_name"] = job_file_name(job, index)
+
+   workers = workers or os.cpu_count() or 1
+   if workers == 1 or len(jobs) <= 1:
+       results = [render_job(job, output_dir) for job in jobs]
+   else:
+       # Qt is not fork safe, so workers are spawned fresh and create their own QApplication
+       context = multiprocessing.get_context("spawn")
+       with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as pool:
+           chunk_size = max(1, len(jobs) // (workers * 4))
+           results = list(pool.map(render_job, jobs, itertools.repeat(output_dir), chunksize=chunk_size))
+
+   for file_name, _ in results:
+       print(f"wrote {file_name}")
+
+   if merge:
+       # Snapshots are tiny, so the merged PDF is redrawn here instead of combining files
+       from export import export_pdf
+
+       _ensure_app()
+       export_pdf([snapshot for _, snapshot in results], merge, [job["name"] for job in jobs])
+       print(f"wrote {merge}")
+   return [file_name for file_name, _ in results]
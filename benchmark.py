@@ -0,0 +1,546 @@
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import io
+import json
+import platform
+import re
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+import PySide6
+from PySide6.QtCore import QCoreApplication, QEvent, qInstallMessageHandler
+from PySide6.QtWidgets import QApplication, QScrollArea, QWidget
+
+import numpy as np
+
+from fretboard_model import NoteCalculator
+from main import FRETBOARD_RENDERERS, MainWindow, MIN_FRETS, MIN_STRINGS
+from pitch import PitchDetector, read_pcm
+from scales import get_scale_engine
+
+
+# Board sizes (strings, frets) every operation is timed at
+# Sizes past a renderer's max_strings/max_frets are skipped for it
+DEFAULT_SIZES = [(1, 5), (4, 12), (6, 12), (6, 24), (8, 18), (12, 24), (24, 36), (64, 48)]
+# Viewport of the scroll case, about what the window leaves for the board
+SCROLL_VIEWPORT = (900, 400)
+# Relative slowdown against the baseline that counts as a regression
+DEFAULT_THRESHOLD = 0.25
+# Seconds of synthetic audio for the pitch detection benchmark
+DEFAULT_PITCH_SECONDS = 30
+PITCH_SAMPLE_RATE = 44100
+
+
+# --- Counters ---
+
+class StyleSheetCounter:
+   """Counts QWidget.setStyleSheet calls made from Python while active"""
+
+   def __init__(self):
+       self.calls = 0
+       self._original = QWidget.setStyleSheet
+
+   def __enter__(self):
+       original = self._original
+
+       def counting_set_style_sheet(widget, style_sheet):
+           self.calls += 1
+           return original(widget, style_sheet)
+
+       QWidget.setStyleSheet = counting_set_style_sheet
+       return self
+
+   def __exit__(self, *exc_info):
+       QWidget.setStyleSheet = self._original
+
+
+def reset_peak_rss():
+   """Restart the peak RSS from the current RSS; False where the kernel can't (only Linux can)"""
+   try:
+       with open("/proc/self/clear_refs", "w") as f:
+           f.write("5")
+       return True
+   except OSError:
+       return False
+
+
+def peak_rss_kb():
+   """Peak resident set size of this process since the last reset_peak_rss(), in KiB"""
+   try:
+       with open("/proc/self/status") as f:
+           for line in f:
+               if line.startswith("VmHWM:"):
+                   return int(line.split()[1])
+   except OSError:
+       pass
+   # Without /proc: the high-water mark of the whole process so far
+   peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+   # macOS reports bytes, Linux KiB
+   return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def current_rss_kb():
+   """Resident set size right now in KiB, or None where /proc isn't available"""
+   try:
+       with open("/proc/self/statm") as f:
+           return int(f.read().split()[1]) * resource.getpagesize() // 1024
+   except OSError:
+       return None
+
+
+def widget_count(widget):
+   """Widgets currently shown under widget, not counting pooled hidden ones"""
+   return 1 + sum(1 for child in widget.findChildren(QWidget) if child.isVisibleTo(widget))
+
+
+def settle():
+   # Let Qt run the layout, polish and paint work the operation queued
+   QApplication.processEvents()
+
+
+def dispose(cleanup):
+   cleanup()
+   # deleteLater only runs from a real event loop, flush it so RSS reflects live boards
+   QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+
+_seen_messages = set()
+
+
+def _quiet_qt_messages(mode, context, message):
+   # The offscreen platform warns on every top-level resize, and per-widget warnings
+   # repeat for every board built; show each kind of message once
+   kind = re.sub(r"0x[0-9a-f]+", "0x...", message)
+   if "propagateSizeHints" in message or kind in _seen_messages:
+       return
+   _seen_messages.add(kind)
+   print(kind, file=sys.stderr)
+
+
+# --- Cases ---
+# Each case takes (renderer, strings, frets) and returns (target, operation, reset, cleanup).
+# The target is what widgets are counted on and the operation is what gets timed;
+# reset (or None) undoes the operation between runs without being timed.
+
+def _make_board(renderer, strings, frets):
+   board = FRETBOARD_RENDERERS[renderer](defer_build=True)
+   board.set_dimensions(strings, frets)
+   board.ensure_built()
+   board.show()
+   settle()
+   return board
+
+
+def _make_window(renderer, strings, frets):
+   window = MainWindow(renderer=renderer)
+   window.fretboard.set_dimensions(strings, frets)
+   window.build_fretboard()
+   window.show()
+   settle()
+   return window
+
+
+def case_initialize_grid(renderer, strings, frets):
+   board = FRETBOARD_RENDERERS[renderer](defer_build=True)
+   board.set_dimensions(strings, frets)
+   board.show()
+
+   def run():
+       board.initialize_grid()
+       settle()
+
+   return board, run, None, board.deleteLater
+
+
+def case_update_highlighted_notes(renderer, strings, frets):
+   board = _make_board(renderer, strings, frets)
+   state = [False]
+
+   def run():
+       state[0] = not state[0]
+       board.update_highlighted_notes("E", state[0])
+       settle()
+
+   return board, run, None, board.deleteLater
+
+
+def case_update_tuning(renderer, strings, frets):
+   board = _make_board(renderer, strings, frets)
+   notes = ["F", "E"]
+   state = [0]
+
+   def run():
+       state[0] ^= 1
+       board.update_tuning(0, notes[state[0]])
+       settle()
+
+   return board, run, None, board.deleteLater
+
+
+def case_set_tuning(renderer, strings, frets):
+   board = _make_board(renderer, strings, frets)
+   # Every string changes on each switch
+   tunings = [["D"] * strings, ["E"] * strings]
+   state = [0]
+
+   def run():
+       state[0] ^= 1
+       board.set_tuning(tunings[state[0]])
+       settle()
+
+   return board, run, None, board.deleteLater
+
+
+def case_set_label_mode(renderer, strings, frets):
+   board = _make_board(renderer, strings, frets)
+   # Cycle names -> octaves -> frequencies, relabelling every cell each time
+   modes = ["octave", "frequency", "name"]
+   state = [0]
+
+   def run():
+       board.set_label_mode(modes[state[0] % len(modes)])
+       state[0] += 1
+       settle()
+
+   return board, run, None, board.deleteLater
+
+
+def case_repaint(renderer, strings, frets):
+   board = _make_board(renderer, strings, frets)
+
+   def run():
+       board.repaint()
+
+   return board, run, None, board.deleteLater
+
+
+def case_scroll(renderer, strings, frets):
+   board = FRETBOARD_RENDERERS[renderer](defer_build=True)
+   board.set_dimensions(strings, frets)
+   board.ensure_built()
+   scroll_area = QScrollArea()
+   scroll_area.setWidget(board)
+   scroll_area.resize(*SCROLL_VIEWPORT)
+   scroll_area.show()
+   settle()
+   bars = (scroll_area.horizontalScrollBar(), scroll_area.verticalScrollBar())
+   state = [0]
+
+   def run():
+       # One diagonal step per frame, bouncing between the ends of the board
+       state[0] += 1
+       for bar in bars:
+           bar.setValue((state[0] * 37) % (bar.maximum() + 1))
+       scroll_area.viewport().repaint()
+
+   return board, run, None, scroll_area.deleteLater
+
+
+def case_add_fret(renderer, strings, frets):
+   # Start one fret short so the timed add lands on the requested size
+   start = frets - 1 if frets > MIN_FRETS else frets
+   board = _make_board(renderer, strings, min(start, FRETBOARD_RENDERERS[renderer].max_frets - 1))
+
+   def run():
+       board.add_fret()
+       settle()
+
+   return board, run, board.remove_fret, board.deleteLater
+
+
+def case_add_string(renderer, strings, frets):
+   start = strings - 1 if strings > MIN_STRINGS else strings
+   board = _make_board(renderer, min(start, FRETBOARD_RENDERERS[renderer].max_strings - 1), frets)
+
+   def run():
+       board.add_string()
+       settle()
+
+   return board, run, board.remove_string, board.deleteLater
+
+
+def case_add_predefined_key(renderer, strings, frets):
+   window = _make_window(renderer, strings, frets)
+   engine = get_scale_engine()
+   keys = [engine.get("C Major"), engine.get("A Minor Pentatonic")]
+   state = [0]
+
+   def run():
+       state[0] ^= 1
+       scale = keys[state[0]]
+       window.add_predefined_key(scale.name, scale.notes)
+       settle()
+
+   return window, run, None, window.deleteLater
+
+
+def case_show_scale_position(renderer, strings, frets):
+   window = _make_window(renderer, strings, frets)
+   window.add_predefined_key("C Major", get_scale_engine().get("C Major").notes)
+   window.find_scale_positions()
+   state = [0]
+
+   def run():
+       state[0] = (state[0] + 1) % max(1, len(window.scale_positions))
+       window.show_scale_position(state[0])
+       settle()
+
+   return window, run, None, window.deleteLater
+
+
+def case_export_to_pdf(renderer, strings, frets):
+   window = _make_window(renderer, strings, frets)
+   window.add_predefined_key("C Major", get_scale_engine().get("C Major").notes)
+   output = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+   output.close()
+
+   def run():
+       # Exports run on a background thread; time the whole export, not just queueing it
+       window.export_to_pdf(output.name).wait()
+       settle()
+
+   def cleanup():
+       window.deleteLater()
+       os.unlink(output.name)
+
+   return window, run, None, cleanup
+
+
+CASES = {
+   "initialize_grid": case_initialize_grid,
+   "update_highlighted_notes": case_update_highlighted_notes,
+   "update_tuning": case_update_tuning,
+   "set_tuning": case_set_tuning,
+   "set_label_mode": case_set_label_mode,
+   "repaint": case_repaint,
+   "scroll": case_scroll,
+   "add_fret": case_add_fret,
+   "add_string": case_add_string,
+   "add_predefined_key": case_add_predefined_key,
+   "show_scale_position": case_show_scale_position,
+   "export_to_pdf": case_export_to_pdf,
+}
+
+# initialize_grid needs a fresh, unbuilt board for every run
+FRESH_PER_RUN = {"initialize_grid"}
+# Cases that time growing their board; at the minimum size they can't start one short, so their
+# results carry the size the board has after the add
+GROWING_CASES = {"add_fret", "add_string"}
+
+
+# --- Runner ---
+
+def run_case(name, renderer, strings, frets, repeat):
+   """Time one case; returns its result dict"""
+   times = []
+   calls = 0
+   widgets = 0
+   rss = None
+   # The peak is process-wide, so each case reports how far it rose above where the case began
+   baseline = current_rss_kb() if reset_peak_rss() else peak_rss_kb()
+   for run_idx in range(repeat):
+       if run_idx == 0 or name in FRESH_PER_RUN:
+           target, operation, reset, cleanup = CASES[name](renderer, strings, frets)
+       with StyleSheetCounter() as counter:
+           start = time.perf_counter()
+           operation()
+           times.append((time.perf_counter() - start) * 1000)
+       calls += counter.calls
+       widgets = widget_count(target)
+       if name in GROWING_CASES:
+           strings, frets = target.string_count, target.fret_count
+       rss = current_rss_kb()
+       if reset is not None:
+           reset()
+           settle()
+       if name in FRESH_PER_RUN or run_idx == repeat - 1:
+           dispose(cleanup)
+
+   return {
+       "name": name,
+       "renderer": renderer,
+       "strings": strings,
+       "frets": frets,
+       "wall_ms": statistics.median(times),
+       "min_ms": min(times),
+       "max_ms": max(times),
+       "runs": repeat,
+       "widgets": widgets,
+       "stylesheet_calls": calls / repeat,
+       "rss_kb": rss,
+       "peak_rss_growth_kb": max(0, peak_rss_kb() - (baseline or 0)),
+   }
+
+
+def run_benchmarks(renderers, sizes, cases, repeat):
+   QApplication.instance() or QApplication(sys.argv[:1])
+   qInstallMessageHandler(_quiet_qt_messages)
+   results = []
+   for renderer in renderers:
+       board_class = FRETBOARD_RENDERERS[renderer]
+       for name in cases:
+           for strings, frets in sizes:
+               if strings > board_class.max_strings or frets > board_class.max_frets:
+                   continue
+               result = run_case(name, renderer, strings, frets, repeat)
+               results.append(result)
+               print(format_result(result), flush=True)
+   return {
+       "meta": {
+           "python": platform.python_version(),
+           "pyside": PySide6.__version__,
+           "platform": platform.platform(),
+           "qpa": os.environ.get("QT_QPA_PLATFORM", ""),
+           "repeat": repeat,
+           "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+       },
+       "results": results,
+   }
+
+
+def format_result(result):
+   return (f"{result['renderer']:8} {result['name']:26} {result['strings']:2}x{result['frets']:<3} "
+           f"{result['wall_ms']:9.2f} ms  {result['widgets']:5} widgets  "
+           f"{result['stylesheet_calls']:7.1f} setStyleSheet  {result['peak_rss_growth_kb'] / 1024:+7.1f} MiB peak")
+
+
+# --- Pitch detection ---
+
+def synthesize_notes(seconds, sample_rate=PITCH_SAMPLE_RATE, note_seconds=0.5, seed=0):
+   """16-bit mono PCM of random guitar-range notes with harmonics, decay and noise, plus their MIDI numbers"""
+   rng = np.random.default_rng(seed)
+   notes = rng.integers(40, 84, max(1, int(seconds / note_seconds)))  # E2 to B5
+   t = np.arange(int(note_seconds * sample_rate)) / sample_rate
+   envelope = 0.3 * np.exp(-2 * t)
+   parts = []
+   for note in notes:
+       frequency = 440 * 2 ** ((note - 69) / 12)
+       parts.append(envelope * sum(np.sin(2 * np.pi * frequency * k * t) / k for k in range(1, 6)))
+   signal = np.concatenate(parts) + rng.normal(0, 0.003, len(parts) * len(t))
+   return (np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes(), notes
+
+
+def run_pitch_benchmark(seconds, sample_rate=PITCH_SAMPLE_RATE, note_seconds=0.5):
+   """Time the detection pipeline on PCM bytes: decoding, framing, FFT autocorrelation, pitch classes"""
+   data, notes = synthesize_notes(seconds, sample_rate, note_seconds)
+   detector = PitchDetector(sample_rate)
+   note_calculator = NoteCalculator()
+   start = time.perf_counter()
+   pitch_classes = [note_calculator.get_pitch_classes(detector.process(chunk))
+                    for chunk in read_pcm(io.BytesIO(data))]
+   elapsed = time.perf_counter() - start
+   pitch_classes = np.concatenate(pitch_classes)
+
+   # Score frames by the note sounding at their centre
+   centres = (np.arange(len(pitch_classes)) * detector.hop_size + detector.frame_size / 2) / sample_rate
+   note_idx = np.minimum((centres / note_seconds).astype(int), len(notes) - 1)
+   expected = notes[note_idx] % 12
+   detected = pitch_classes >= 0
+   audio_seconds = len(data) / 2 / sample_rate
+   result = {
+       "audio_seconds": audio_seconds,
+       "wall_ms": elapsed * 1000,
+       "realtime_factor": audio_seconds / elapsed,
+       "frames": len(pitch_classes),
+       "detected": float(detected.mean()),
+       "accuracy": float((pitch_classes[detected] == expected[detected]).mean()) if detected.any() else 0.0,
+   }
+   print(format_pitch_result(result), flush=True)
+   return result
+
+
+def format_pitch_result(result):
+   return (f"pitch detection  {result['audio_seconds']:.1f} s of 44.1 kHz mono in {result['wall_ms']:.1f} ms  "
+           f"{result['realtime_factor']:.1f}x realtime  {result['detected']:.1%} frames detected  "
+           f"{result['accuracy']:.1%} correct")
+
+
+# --- Baseline comparison ---
+
+def _result_key(result):
+   return (result["renderer"], result["name"], result["strings"], result["frets"])
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+   """Print how each result changed against the baseline; returns the regressed results"""
+   previous = {_result_key(result): result for result in baseline["results"]}
+   regressions = []
+   for result in report["results"]:
+       old = previous.get(_result_key(result))
+       if old is None:
+           continue
+       ratio = result["wall_ms"] / old["wall_ms"] if old["wall_ms"] else 1.0
+       flag = ""
+       if ratio > 1 + threshold:
+           flag = "  REGRESSION"
+           regressions.append(result)
+       elif ratio < 1 - threshold:
+           flag = "  faster"
+       print(f"{result['renderer']:8} {result['name']:26} {result['strings']:2}x{result['frets']:<3} "
+             f"{old['wall_ms']:9.2f} -> {result['wall_ms']:9.2f} ms ({ratio:5.2f}x)  "
+             f"setStyleSheet {old['stylesheet_calls']:.0f} -> {result['stylesheet_calls']:.0f}  "
+             f"widgets {old['widgets']} -> {result['widgets']}{flag}")
+
+   pitch, old_pitch = report.get("pitch"), baseline.get("pitch")
+   if pitch and old_pitch:
+       ratio = old_pitch["realtime_factor"] / pitch["realtime_factor"]
+       flag = ""
+       if ratio > 1 + threshold or pitch["realtime_factor"] < 1:
+           flag = "  REGRESSION"
+           regressions.append(pitch)
+       elif ratio < 1 - threshold:
+           flag = "  faster"
+       print(f"pitch detection  {old_pitch['realtime_factor']:.1f}x -> {pitch['realtime_factor']:.1f}x realtime  "
+             f"accuracy {old_pitch['accuracy']:.1%} -> {pitch['accuracy']:.1%}{flag}")
+   return regressions
+
+
+def parse_size(text):
+   strings, _, frets = text.lower().partition("x")
+   return int(strings), int(frets)
+
+
+def parse_args(argv):
+   parser = argparse.ArgumentParser(description="Time the fretboard hot paths on an offscreen display")
+   parser.add_argument("--renderer", choices=sorted(FRETBOARD_RENDERERS), action="append",
+                       help="fretboard backend to measure, may be repeated (default: grid)")
+   parser.add_argument("--case", choices=list(CASES), action="append",
+                       help="operation to measure, may be repeated (default: all)")
+   parser.add_argument("--size", type=parse_size, action="append", metavar="STRINGSxFRETS",
+                       help="board size, may be repeated (default: 1x5 up to 12x24)")
+   parser.add_argument("--repeat", type=int, default=5, help="runs per case, the median is reported")
+   parser.add_argument("--output", metavar="JSON", help="write the results to this file")
+   parser.add_argument("--baseline", metavar="JSON", help="compare against results saved with --output")
+   parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                       help="relative slowdown reported as a regression (default: 0.25)")
+   parser.add_argument("--pitch-seconds", type=float, default=DEFAULT_PITCH_SECONDS,
+                       help="seconds of synthetic audio to run pitch detection on, 0 to skip (default: 30)")
+   return parser.parse_args(argv[1:])
+
+
+def main(argv):
+   args = parse_args(argv)
+   report = run_benchmarks(args.renderer or ["grid"], args.size or DEFAULT_SIZES,
+                           args.case or list(CASES), max(1, args.repeat))
+   if args.pitch_seconds > 0:
+       report["pitch"] = run_pitch_benchmark(args.pitch_seconds)
+   if args.output:
+       with open(args.output, "w", encoding="utf-8") as f:
+           json.dump(report, f, indent=2)
+       print(f"wrote {args.output}")
+   if args.baseline:
+       with open(args.baseline, encoding="utf-8") as f:
+           baseline = json.load(f)
+       print(f"\ncompared to {args.baseline} ({baseline['meta'].get('time', '?')}):")
+       if compare(report, baseline, args.threshold):
+           return 1
+   return 0
+
+
+if __name__ == "__main__":
+   sys.exit(main(sys.argv))
@@ -0,0 +1,212 @@
+import threading
+from collections import namedtuple, OrderedDict
+
+from fretboard_model import NOTE_INDEX, pitch_matrix
+
+
+# Chord qualities as semitones above the root
+CHORD_QUALITIES = {
+   "maj": (0, 4, 7),
+   "min": (0, 3, 7),
+   "dim": (0, 3, 6),
+   "aug": (0, 4, 8),
+   "sus2": (0, 2, 7),
+   "sus4": (0, 5, 7),
+   "6": (0, 4, 7, 9),
+   "m6": (0, 3, 7, 9),
+   "7": (0, 4, 7, 10),
+   "maj7": (0, 4, 7, 11),
+   "m7": (0, 3, 7, 10),
+   "m7b5": (0, 3, 6, 10),
+   "dim7": (0, 3, 6, 9),
+   "add9": (0, 2, 4, 7),
+   "9": (0, 2, 4, 7, 10),
+}
+
+# frets has one entry per string: a fret number or None for a muted string
+Voicing = namedtuple("Voicing", ["frets", "span", "strings", "position"])
+
+
+class SearchCancelled(Exception):
+   pass
+
+
+def chord_mask(root, quality):
+   """12-bit pitch-class mask of a chord"""
+   root_idx = NOTE_INDEX[root]
+   mask = 0
+   for interval in CHORD_QUALITIES[quality]:
+       mask |= 1 << (root_idx + interval) % 12
+   return mask
+
+
+def voicing_positions(voicing):
+   """(string, fret) of every sounding note of a voicing"""
+   return [(string_idx, fret) for string_idx, fret in enumerate(voicing.frets) if fret is not None]
+
+
+def voicing_label(voicing):
+   """Chord chart style label, lowest string first: 'x 3 2 0 1 0'"""
+   return " ".join("x" if fret is None else str(fret) for fret in reversed(voicing.frets))
+
+
+def _search_window(matrix, mask, low, max_span, min_strings, max_fingers, cancel=None):
+   """All voicings whose lowest fretted note is at fret low (low == 0: open strings only)"""
+   string_count, fret_total = matrix.shape
+   high = min(fret_total - 1, low + max_span - 1) if low else 0
+
+   # Choices per string: open string and frets in the window that play a chord tone
+   choices = []
+   for string_idx in range(string_count):
+       row = matrix[string_idx]
+       options = [0] if mask >> int(row[0]) & 1 else []
+       if low:
+           options += [fret for fret in range(low, high + 1) if mask >> int(row[fret]) & 1]
+       choices.append(options)
+
+   # reach[s]: chord tones still available on strings s.. (prunes branches that can't complete)
+   reach = [0] * (string_count + 1)
+   for string_idx in range(string_count - 1, -1, -1):
+       tones = 0
+       for fret in choices[string_idx]:
+           tones |= 1 << int(matrix[string_idx][fret])
+       reach[string_idx] = reach[string_idx + 1] | tones
+
+   results = []
+   frets = [None] * string_count
+   visited = [0]
+
+   def place(string_idx, covered, sounding, fingers, has_low, started, ended):
+       visited[0] += 1
+       if cancel is not None and visited[0] & 0x3FF == 0 and cancel.is_set():
+           raise SearchCancelled()
+       if covered | reach[string_idx] != mask:
+           return
+       if string_idx == string_count:
+           if sounding >= min_strings and (has_low or not low):
+               fretted = [fret for fret in frets if fret]
+               span = max(fretted) - min(fretted) + 1 if fretted else 0
+               results.append(Voicing(tuple(frets), span, sounding, min(fretted) if fretted else 0))
+           return
+
+       # Sounding strings form one unbroken block; a mute inside it ends the block
+       if not started or ended:
+           place(string_idx + 1, covered, sounding, fingers, has_low, started, ended)
+       else:
+           place(string_idx + 1, covered, sounding, fingers, has_low, started, True)
+       if ended:
+           return
+       for fret in choices[string_idx]:
+           # Notes on the lowest fret share one barre finger
+           extra = 0 if fret == 0 or (fret == low and has_low) else 1
+           if fingers + extra > max_fingers:
+               continue
+           frets[string_idx] = fret
+           place(string_idx + 1, covered | 1 << int(matrix[string_idx][fret]), sounding + 1,
+                 fingers + extra, has_low or fret == low, True, False)
+           frets[string_idx] = None
+
+   place(0, 0, 0, 0, False, False, False)
+   return results
+
+
+def _search_window_job(args):
+   # Top-level so the process pool can pickle it
+   return _search_window(*args)
+
+
+def rank_voicings(voicings):
+   """Tightest span first, then most strings, then lowest position"""
+   return sorted(voicings, key=lambda v: (v.span, -v.strings, v.position,
+                                          tuple(-1 if fret is None else fret for fret in v.frets)))
+
+
+# (tuning, chord mask, fret_count, span, min strings, max fingers) -> ranked voicings,
+# shared by VoicingSearch threads
+_voicing_cache = OrderedDict()
+_voicing_cache_lock = threading.Lock()
+_VOICING_CACHE_SIZE = 64
+
+
+def find_voicings(tuning, fret_count, mask, max_span=4, min_strings=3, max_fingers=4,
+                  processes=None, cancel=None):
+   """Every playable voicing of a chord mask on the given tuning, ranked.
+
+   processes > 1 searches the fret windows in a process pool, which only pays off for
+   searches that take seconds (starting the pool alone takes about as long); cancel is an
+   optional threading.Event that aborts the search with SearchCancelled.
+   """
+   key = (tuple(tuning), mask, fret_count, max_span, min_strings, max_fingers)
+   with _voicing_cache_lock:
+       if key in _voicing_cache:
+           _voicing_cache.move_to_end(key)
+           return _voicing_cache[key]
+
+   matrix = pitch_matrix(tuning, fret_count)
+   min_strings = min(min_strings, len(tuning))
+   windows = [(matrix, mask, low, max_span, min_strings, max_fingers) for low in range(fret_count + 1)]
+
+   voicings = []
+   if processes and processes > 1:
+       # Imported here so the GUI doesn't pay for multiprocessing at startup
+       import multiprocessing
+       from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+       context = multiprocessing.get_context("spawn")
+       pool = ProcessPoolExecutor(max_workers=processes, mp_context=context)
+       try:
+           pending = {pool.submit(_search_window_job, window) for window in windows}
+           while pending:
+               done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+               if cancel is not None and cancel.is_set():
+                   raise SearchCancelled()
+               for future in done:
+                   voicings.extend(future.result())
+       finally:
+           # Don't wait for windows still running when cancelled; their results are dropped
+           pool.shutdown(wait=False, cancel_futures=True)
+   else:
+       for window in windows:
+           voicings.extend(_search_window(*window, cancel=cancel))
+
+   result = rank_voicings(voicings)
+   with _voicing_cache_lock:
+       _voicing_cache[key] = result
+       if len(_voicing_cache) > _VOICING_CACHE_SIZE:
+           _voicing_cache.popitem(last=False)
+   return result
+
+
+class VoicingSearch:
+   """Runs find_voicings on a background thread; cancel() stops it early.
+
+   on_done(voicings) is always called from that thread: with the ranked voicings, or None
+   when the search was cancelled or failed, in which case error holds the reason.
+   """
+
+   def __init__(self, tuning, fret_count, mask, on_done, max_span=4, processes=None):
+       self.cancel_event = threading.Event()
+       self.error = None
+       self._args = (tuple(tuning), fret_count, mask, max_span)
+       self._processes = processes
+       self._on_done = on_done
+       self._thread = threading.Thread(target=self._run, daemon=True)
+
+   def start(self):
+       self._thread.start()
+
+   def cancel(self):
+       self.cancel_event.set()
+
+   def _run(self):
+       tuning, fret_count, mask, max_span = self._args
+       voicings = None
+       try:
+           voicings = find_voicings(tuning, fret_count, mask, max_span=max_span,
+                                    processes=self._processes, cancel=self.cancel_event)
+       except SearchCancelled:
+           pass
+       except Exception as e:
+           self.error = str(e) or type(e).__name__
+       finally:
+           self._on_done(voicings)
@@ -0,0 +1,310 @@
+import os
+import queue
+import threading
+
+from PySide6.QtCore import Qt, QRectF, QSize, QMarginsF
+from PySide6.QtGui import QPainter, QPdfWriter, QPageSize, QPageLayout, QColor, QImage
+from PySide6.QtSvg import QSvgGenerator
+
+from fretboard_model import NOTES, note_matrix, snapshot_highlights
+from fretboard_painter import FretboardGeometry, cell_states, draw_fretboard, get_cell_cache, make_font
+
+
+EXPORT_FORMATS = {
+   ".pdf": "PDF Files (*.pdf)",
+   ".svg": "SVG Files (*.svg)",
+   ".png": "PNG Images (*.png)",
+}
+
+TITLE_HEIGHT = 70
+TITLE_COLOR = QColor("#2c3e50")
+# Device pixel ratio of PNG exports, 2 gives print-friendly detail
+PNG_SCALE = 2.0
+
+
+def export_extension(file_name):
+   """Lower-case extension of file_name, raising ValueError for formats that can't be exported"""
+   extension = os.path.splitext(file_name)[1].lower()
+   if extension not in EXPORT_FORMATS:
+       raise ValueError(f"Unsupported export format: {extension or os.path.basename(file_name)}")
+   return extension
+
+
+def with_export_extension(file_name, name_filter=None):
+   """file_name with the extension of the chosen dialog filter (PDF by default) if it has none"""
+   if os.path.splitext(file_name)[1]:
+       return file_name
+   extension = next((extension for extension, title in EXPORT_FORMATS.items() if title == name_filter), ".pdf")
+   return file_name + extension
+
+
+def snapshot_title(snapshot):
+   """Default sheet caption: tuning and highlighted notes"""
+   tuning = " ".join(snapshot.tuning)
+   notes = " ".join(note for note in NOTES if note in snapshot.highlighted_notes)
+   return f"Tuning: {tuning}    Highlighted: {notes or '-'}"
+
+
+def sheet_size(snapshot):
+   """Size in layout pixels of a rendered sheet: caption plus fretboard"""
+   board = FretboardGeometry(len(snapshot.tuning), snapshot.fret_count, show_controls=False).size()
+   return QSize(board.width(), board.height() + TITLE_HEIGHT)
+
+
+def stacked_size(snapshots):
+   """Size in layout pixels of sheets drawn one under another"""
+   sizes = [sheet_size(snapshot) for snapshot in snapshots]
+   return QSize(max(size.width() for size in sizes), sum(size.height() for size in sizes))
+
+
+def render_sheet(painter, snapshot, title=None, cell_cache=None, dpr=1.0):
+   """Draw a caption and the fretboard of snapshot at the painter origin.
+
+   Vector primitives throughout unless a cell_cache is given, then the cells are copied
+   from its images rendered at dpr.
+   """
+   geometry = FretboardGeometry(len(snapshot.tuning), snapshot.fret_count, show_controls=False)
+   size = sheet_size(snapshot)
+
+   painter.setPen(TITLE_COLOR)
+   painter.setFont(make_font(24, bold=True))
+   painter.drawText(QRectF(0, 0, size.width(), 36), Qt.AlignLeft | Qt.AlignVCenter,
+                    title or "Notez - String Instrument Visualizer")
+   painter.setFont(make_font(14))
+   painter.drawText(QRectF(0, 36, size.width(), 26), Qt.AlignLeft | Qt.AlignVCenter, snapshot_title(snapshot))
+
+   states = cell_states(*snapshot_highlights(snapshot))
+   painter.save()
+   painter.translate(0, TITLE_HEIGHT)
+   draw_fretboard(painter, geometry, snapshot.tuning,
+                  note_matrix(snapshot.tuning, snapshot.fret_count), states, cell_cache, dpr)
+   painter.restore()
+
+
+def render_sheets(painter, snapshots, titles=None, cell_cache=None, dpr=1.0):
+   """Draw the sheets of several snapshots one under another, like stacked instruments"""
+   top = 0
+   for index, snapshot in enumerate(snapshots):
+       painter.save()
+       painter.translate(0, top)
+       render_sheet(painter, snapshot, titles[index] if titles else None, cell_cache, dpr)
+       painter.restore()
+       top += sheet_size(snapshot).height()
+
+
+def _fit_to_page(painter, snapshot, page_width, page_height):
+   # Scale the sheet to the page width (or height if that is tighter) and center it
+   size = sheet_size(snapshot)
+   scale = min(page_width / size.width(), page_height / size.height())
+   painter.translate((page_width - size.width() * scale) / 2, 0)
+   painter.scale(scale, scale)
+
+
+def create_pdf_writer(file_name):
+   writer = QPdfWriter(file_name)
+   writer.setPageSize(QPageSize(QPageSize.A4))
+   writer.setPageOrientation(QPageLayout.Landscape)
+   writer.setPageMargins(QMarginsF(10, 10, 10, 10), QPageLayout.Millimeter)
+   writer.setResolution(300)
+   writer.setCreator("Notez")
+   return writer
+
+
+def render_pdf_page(painter, writer, snapshot, title=None):
+   painter.save()
+   _fit_to_page(painter, snapshot, writer.width(), writer.height())
+   render_sheet(painter, snapshot, title)
+   painter.restore()
+
+
+def export_pdf(snapshots, file_name, titles=None, on_page=None):
+   """Write one vector PDF page per snapshot; on_page(done, total) is called after every page"""
+   writer = create_pdf_writer(file_name)
+   painter = QPainter()
+   if not painter.begin(writer):
+       raise OSError(f"Could not write {file_name}")
+   try:
+       for page, snapshot in enumerate(snapshots):
+           if page:
+               writer.newPage()
+           render_pdf_page(painter, writer, snapshot, titles[page] if titles else None)
+           if on_page:
+               on_page(page + 1, len(snapshots))
+   finally:
+       painter.end()
+
+
+def export_svg(snapshots, file_name, titles=None):
+   """Write the snapshots as a single SVG, their sheets stacked top to bottom"""
+   size = stacked_size(snapshots)
+   generator = QSvgGenerator()
+   generator.setFileName(file_name)
+   generator.setSize(size)
+   generator.setViewBox(QRectF(0, 0, size.width(), size.height()))
+   generator.setTitle(titles[0] if titles else "Notez fretboard")
+   painter = QPainter()
+   if not painter.begin(generator):
+       raise OSError(f"Could not write {file_name}")
+   try:
+       render_sheets(painter, snapshots, titles)
+   finally:
+       painter.end()
+
+
+def export_png(snapshots, file_name, titles=None, scale=PNG_SCALE):
+   """Write the snapshots as one PNG image, their sheets stacked top to bottom; the cells come
+   from the shared cell image cache"""
+   size = stacked_size(snapshots)
+   image = QImage(round(size.width() * scale), round(size.height() * scale), QImage.Format_ARGB32_Premultiplied)
+   image.setDevicePixelRatio(scale)
+   image.fill(Qt.white)
+   painter = QPainter(image)
+   try:
+       render_sheets(painter, snapshots, titles, get_cell_cache(), scale)
+   finally:
+       painter.end()
+   if not image.save(file_name, "PNG"):
+       raise OSError(f"Could not write {file_name}")
+
+
+def export_snapshots(snapshots, file_name, titles=None, on_page=None):
+   """PDF gets one page per snapshot, SVG and PNG one sheet with every snapshot stacked"""
+   extension = export_extension(file_name)
+   if extension == ".pdf":
+       export_pdf(snapshots, file_name, titles, on_page)
+       return
+   if extension == ".svg":
+       export_svg(snapshots, file_name, titles)
+   else:
+       export_png(snapshots, file_name, titles)
+   if on_page:
+       on_page(1, 1)
+
+
+def export_snapshot(snapshot, file_name, title=None):
+   """Export to PDF, SVG or PNG depending on the file extension"""
+   export_snapshots([snapshot], file_name, [title] if title else None)
+
+
+# --- Background exports ---
+
+class ExportCancelled(Exception):
+   pass
+
+
+class ExportJob:
+   """One export of snapshots to file_name, queued on or run by an ExportQueue"""
+
+   def __init__(self, snapshots, file_name, titles=None):
+       self.snapshots = list(snapshots)
+       self.file_name = file_name
+       self.titles = titles
+       self.pages_done = 0
+       self.error = None
+       self.cancel_event = threading.Event()
+       self._finished = threading.Event()
+
+   @property
+   def pages(self):
+       return len(self.snapshots) if os.path.splitext(self.file_name)[1].lower() == ".pdf" else 1
+
+   @property
+   def cancelled(self):
+       return self.cancel_event.is_set()
+
+   @property
+   def finished(self):
+       return self._finished.is_set()
+
+   def cancel(self):
+       self.cancel_event.set()
+
+   def wait(self, timeout=None):
+       """Block until the job ran, failed or was cancelled; returns False on timeout"""
+       return self._finished.wait(timeout)
+
+
+class ExportQueue:
+   """Runs export jobs one after another on a background thread.
+
+   Jobs only hold immutable snapshots, so the boards can keep changing meanwhile. The file
+   is written next to its target and moved into place when complete, so a cancelled or
+   failed export never leaves half a file behind. on_progress(job, done, total) and
+   on_done(job) are called from the worker thread.
+   """
+
+   def __init__(self, on_progress=None, on_done=None):
+       self.on_progress = on_progress
+       self.on_done = on_done
+       self.current = None
+       self._pending = []
+       self._lock = threading.Lock()
+       self._jobs = queue.Queue()
+       self._thread = None
+
+   def submit(self, snapshots, file_name, titles=None):
+       """Queue an export; raises ValueError at once if file_name isn't an export format"""
+       export_extension(file_name)
+       job = ExportJob(snapshots, file_name, titles)
+       with self._lock:
+           self._pending.append(job)
+           if self._thread is None:
+               self._thread = threading.Thread(target=self._run, daemon=True)
+               self._thread.start()
+       self._jobs.put(job)
+       return job
+
+   def queued(self):
+       """Jobs waiting behind the current one"""
+       with self._lock:
+           return [job for job in self._pending if not job.cancelled]
+
+   def cancel_all(self):
+       with self._lock:
+           jobs = self._pending + ([self.current] if self.current else [])
+       for job in jobs:
+           job.cancel()
+
+   def _run(self):
+       while True:
+           job = self._jobs.get()
+           with self._lock:
+               self._pending.remove(job)
+               self.current = job
+           try:
+               if not job.cancelled:
+                   self._export(job)
+           except ExportCancelled:
+               pass
+           except Exception as e:
+               # Any failure belongs to this job only; the worker keeps serving the queue
+               job.error = str(e) or type(e).__name__
+           finally:
+               with self._lock:
+                   self.current = None
+               if self.on_done:
+                   self.on_done(job)
+               job._finished.set()
+
+   def _export(self, job):
+       root, extension = os.path.splitext(job.file_name)
+       temp_name = f"{root}.partial{extension}"
+
+       def on_page(done, total):
+           job.pages_done = done
+           if self.on_progress:
+               self.on_progress(job, done, total)
+           if job.cancelled and done < total:
+               raise ExportCancelled()
+
+       try:
+           if self.on_progress:
+               self.on_progress(job, 0, job.pages)
+           export_snapshots(job.snapshots, temp_name, job.titles, on_page)
+           if job.cancelled:
+               raise ExportCancelled()
+           os.replace(temp_name, job.file_name)
+       except BaseException:
+           if os.path.exists(temp_name):
+               os.remove(temp_name)
+           raise
@@ -0,0 +1,225 @@
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+
+# Notes in the chromatic scale (using sharps)
+NOTES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+NOTE_INDEX = {note: idx for idx, note in enumerate(NOTES)}
+
+# Pitch class of every fret for every possible open note: _FRET_TABLE[open][fret]
+_FRET_TABLE = (np.arange(12)[:, None] + np.arange(12)[None, :]) % 12
+
+
+# Pitch reference: MIDI note 69 is A4
+A4_MIDI = 69
+A4_FREQUENCY = 440.0
+# Octave of the lowest string when a tuning only names pitch classes (E2 on a guitar)
+DEFAULT_LOWEST_OCTAVE = 2
+
+# What note cells show: pitch class, octave-qualified pitch or frequency in Hz
+LABEL_MODES = ("name", "octave", "frequency")
+
+# Membership row for every 12-bit mask: _MASK_BITS[mask][pitch_class]
+_MASK_BITS = (np.arange(4096)[:, None] >> np.arange(12)[None, :] & 1).astype(bool)
+
+
+def frequencies_to_pitch_classes(frequencies, a4=A4_FREQUENCY):
+   """Nearest pitch class (0 = C) of every frequency in Hz, -1 where a frequency is NaN or <= 0"""
+   frequencies = np.asarray(frequencies, dtype=np.float64)
+   valid = frequencies > 0  # False for NaN too
+   midi = 69 + 12 * np.log2(np.where(valid, frequencies, a4) / a4)
+   return np.where(valid, np.rint(midi).astype(np.int64) % 12, -1)
+
+
+def pitch_name(midi_note):
+   """Octave-qualified name of a MIDI note number, e.g. 40 -> E2"""
+   return f"{NOTES[midi_note % 12]}{midi_note // 12 - 1}"
+
+
+def open_midi_notes(tuning, lowest_octave=DEFAULT_LOWEST_OCTAVE, octaves=()):
+   """MIDI note of every open string, highest string first like the tuning.
+
+   octaves gives the octave of strings whose register can't be guessed (unison and octave
+   courses, re-entrant strings), highest string first; a missing or None entry is derived.
+   A derived lowest (last) string sits in lowest_octave and every other derived string is
+   the first pitch of its class higher than the string below, which gives the usual
+   octaves for guitar, bass and mandolin tunings.
+   """
+   midi_notes = []
+   below = None
+   for string_idx in reversed(range(len(tuning))):
+       pitch_class = NOTE_INDEX[tuning[string_idx]]
+       octave = octaves[string_idx] if string_idx < len(octaves) else None
+       if octave is None and below is None:
+           octave = lowest_octave
+       if octave is not None:
+           midi_note = (octave + 1) * 12 + pitch_class
+       else:
+           midi_note = below + 1 + (pitch_class - below - 1) % 12
+       midi_notes.append(midi_note)
+       below = midi_note
+   return midi_notes[::-1]
+
+
+# Everything the display, audio and analysis code needs per cell, strings x (frets + 1)
+PitchTable = namedtuple("PitchTable", [
+   "pitches",  # Fractional MIDI pitch (semitones), exact for 12-TET
+   "midi",  # Nearest MIDI note number
+   "cents",  # Offset from the nearest MIDI note, 0 for 12-TET
+   "frequencies",  # Hz
+   "names",  # Octave-qualified names, with the cents offset outside 12-TET
+   "frequency_labels",  # Frequencies formatted for a note cell
+])
+
+
+def _frequency_label(frequency):
+   return f"{frequency:.0f}" if frequency >= 1000 else f"{frequency:.1f}"
+
+
+def _read_only(*arrays):
+   for array in arrays:
+       array.setflags(write=False)
+
+
+@lru_cache(maxsize=256)
+def _pitch_table(tuning, fret_count, lowest_octave, a4, divisions, octaves):
+   open_notes = np.array(open_midi_notes(tuning, lowest_octave, octaves), dtype=np.float64)
+   # Open strings are tuned to named pitches, frets divide the octave into equal steps
+   pitches = open_notes[:, None] + np.arange(fret_count + 1)[None, :] * (12 / divisions)
+   frequencies = a4 * 2 ** ((pitches - A4_MIDI) / 12)
+   midi = np.rint(pitches).astype(np.int16)
+   cents = np.rint((pitches - midi) * 100).astype(np.int16)
+   _read_only(pitches, midi, cents, frequencies)
+   names = tuple(tuple(pitch_name(note) + (f"{offset:+d}" if offset else "") for note, offset in zip(*row))
+                 for row in zip(midi.tolist(), cents.tolist()))
+   frequency_labels = tuple(tuple(map(_frequency_label, row)) for row in frequencies.tolist())
+   return PitchTable(pitches, midi, cents, frequencies, names, frequency_labels)
+
+
+def pitch_table(tuning, fret_count, lowest_octave=DEFAULT_LOWEST_OCTAVE, a4=A4_FREQUENCY, divisions=12,
+                octaves=()):
+   """Pitch, MIDI number, frequency and labels of every string and fret, cached and read-only"""
+   return _pitch_table(tuple(tuning), fret_count, lowest_octave, float(a4), divisions, tuple(octaves))
+
+
+def label_matrix(tuning, fret_count, mode="name", lowest_octave=DEFAULT_LOWEST_OCTAVE,
+                 a4=A4_FREQUENCY, divisions=12, octaves=()):
+   """Text of every note cell for one of LABEL_MODES, cached"""
+   if mode == "name":
+       return note_matrix(tuning, fret_count)
+   table = pitch_table(tuning, fret_count, lowest_octave, a4, divisions, octaves)
+   if mode == "octave":
+       return table.names
+   if mode == "frequency":
+       return table.frequency_labels
+   raise ValueError(f"Unknown label mode: {mode}")
+
+
+def notes_to_mask(notes):
+   """Pack a collection of note names into a 12-bit pitch-class mask"""
+   mask = 0
+   for note in notes:
+       mask |= 1 << NOTE_INDEX[note]
+   return mask
+
+
+def mask_to_notes(mask):
+   """Unpack a 12-bit pitch-class mask into note names in chromatic order"""
+   return [note for idx, note in enumerate(NOTES) if mask >> idx & 1]
+
+
+@lru_cache(maxsize=256)
+def _pitch_matrix(tuning, fret_count):
+   open_notes = np.fromiter((NOTE_INDEX[note] for note in tuning), dtype=np.int8, count=len(tuning))
+   # Fret pattern repeats every 12 frets, so tile the table instead of doing the modulo per cell
+   columns = np.arange(fret_count + 1) % 12
+   matrix = _FRET_TABLE[open_notes][:, columns].astype(np.int8)
+   matrix.setflags(write=False)
+   return matrix
+
+
+def pitch_matrix(tuning, fret_count):
+   """Strings x (frets + 1) matrix of pitch classes (0 = C), cached and read-only"""
+   return _pitch_matrix(tuple(tuning), fret_count)
+
+
+@lru_cache(maxsize=256)
+def _note_matrix(tuning, fret_count):
+   matrix = _pitch_matrix(tuning, fret_count)
+   return tuple(tuple(NOTES[idx] for idx in row) for row in matrix.tolist())
+
+
+def note_matrix(tuning, fret_count):
+   """Note names for every string and fret as a tuple of tuples, cached"""
+   return _note_matrix(tuple(tuning), fret_count)
+
+
+def highlight_mask(matrix, notes):
+   """Boolean matrix of the cells whose pitch class is in notes"""
+   mask = notes if isinstance(notes, int) else notes_to_mask(notes)
+   return _MASK_BITS[mask][matrix]
+
+
+def position_mask(shape, positions):
+   """Boolean strings x frets matrix with the given (string, fret) cells set"""
+   mask = np.zeros(shape, dtype=bool)
+   for string_idx, fret in positions:
+       if string_idx < shape[0] and fret < shape[1]:
+           mask[string_idx, fret] = True
+   return mask
+
+
+# Immutable copy of everything needed to draw a board; string count is len(tuning)
+FretboardSnapshot = namedtuple("FretboardSnapshot",
+                               ["tuning", "fret_count", "highlighted_notes", "highlighted_positions"],
+                               defaults=(frozenset(),))
+
+
+def make_snapshot(tuning, fret_count, highlighted_notes=(), highlighted_positions=()):
+   return FretboardSnapshot(tuple(tuning), fret_count, frozenset(highlighted_notes),
+                            frozenset(highlighted_positions))
+
+
+def snapshot_highlights(snapshot):
+   """Boolean matrices of a snapshot's highlighted notes and highlighted single positions"""
+   matrix = pitch_matrix(snapshot.tuning, snapshot.fret_count)
+   return (highlight_mask(matrix, snapshot.highlighted_notes),
+           position_mask(matrix.shape, snapshot.highlighted_positions))
+
+
+class NoteCalculator:
+   def __init__(self):
+       # Notes in the chromatic scale (using sharps)
+       self.notes = list(NOTES)
+
+   def get_note_at_fret(self, open_note, fret):
+       """Calculate the note at a specific fret given the open string note"""
+       return NOTES[(NOTE_INDEX[open_note] + fret) % 12]
+
+   def get_pitch_matrix(self, tuning, fret_count):
+       """Pitch classes for the whole fretboard in one lookup"""
+       return pitch_matrix(tuning, fret_count)
+
+   def get_note_matrix(self, tuning, fret_count):
+       """Note names for the whole fretboard in one lookup"""
+       return note_matrix(tuning, fret_count)
+
+   def get_pitch_table(self, tuning, fret_count, lowest_octave=DEFAULT_LOWEST_OCTAVE,
+                       a4=A4_FREQUENCY, divisions=12, octaves=()):
+       """Octave-qualified pitches and frequencies for the whole fretboard in one lookup"""
+       return pitch_table(tuning, fret_count, lowest_octave, a4, divisions, octaves)
+
+   def get_label_matrix(self, tuning, fret_count, mode="name", lowest_octave=DEFAULT_LOWEST_OCTAVE,
+                        a4=A4_FREQUENCY, divisions=12, octaves=()):
+       """Cell texts for the whole fretboard in one lookup"""
+       return label_matrix(tuning, fret_count, mode, lowest_octave, a4, divisions, octaves)
+
+   def get_pitch_classes(self, frequencies, a4=A4_FREQUENCY):
+       """Pitch class of every detected frequency, -1 where nothing was detected"""
+       return frequencies_to_pitch_classes(frequencies, a4)
+
+   def get_highlight_mask(self, tuning, fret_count, notes):
+       """Cells of the fretboard that show one of the given notes"""
+       return highlight_mask(pitch_matrix(tuning, fret_count), notes)
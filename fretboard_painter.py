@@ -0,0 +1,309 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from PySide6.QtCore import Qt, QPointF, QRectF, QSize
+from PySide6.QtGui import QColor, QFont, QImage, QPainter, QPen
+
+
+# Same palette as the FretboardGrid stylesheets
+HEADER_COLOR = QColor("#232946")
+HEADER_TEXT_COLOR = QColor("#fffffe")
+BUTTON_COLOR = QColor("#eebbc3")
+COMBO_COLOR = QColor("#fffffe")
+COMBO_BORDER_COLOR = QColor("#b8c1ec")
+NOTE_TEXT_COLOR = QColor("#232946")
+CELL_BORDER_COLOR = QColor("#232946")
+NOTE_COLORS = {
+   "open": QColor("#eebbc3"),
+   "even": QColor("#b8c1ec"),
+   "odd": QColor("#fffffe"),
+   "highlight": QColor("#f9bc60"),
+}
+
+# Fonts are sized in pixels so screen, PDF and SVG output share the same layout
+HEADER_FONT_SIZE = 16
+NOTE_FONT_SIZE = 13
+
+# Cell metrics roughly matching the QFrame/QLabel grid
+CELL_WIDTH = 44
+CELL_HEIGHT = 34
+SPACING = 3
+HEADER_WIDTH = 170
+HEADER_HEIGHT = 40
+CONTROL_SIZE = 36
+
+# Rendered cell images kept by the shared cache; a 44x34 cell is ~7 KB at 1x, ~27 KB at 2x
+CELL_CACHE_BYTES = 32 * 1024 * 1024
+# Transparent border around a cached cell so its antialiased outline isn't clipped
+CELL_PADDING = 1
+
+
+# Cell style states, cell_states() returns indexes into this tuple
+NOTE_STATES = ("open", "even", "odd", "highlight")
+OPEN, EVEN, ODD, HIGHLIGHT = range(4)
+
+
+def note_state(fret, is_highlighted):
+   """Style state of a note cell: open, highlight, even or odd"""
+   if fret == 0:
+       return "open"
+   elif is_highlighted:
+       return "highlight"
+   elif fret % 2 == 0:
+       return "even"
+   else:
+       return "odd"
+
+
+def cell_states(highlighted, positions=None):
+   """State index of every cell; fret 0 keeps the open style unless its position is highlighted"""
+   frets = np.arange(highlighted.shape[1])
+   states = np.where(highlighted, HIGHLIGHT, np.where(frets % 2 == 0, EVEN, ODD))
+   states[:, 0] = OPEN
+   if positions is not None:
+       states[positions] = HIGHLIGHT
+   return states.astype(np.int8)
+
+
+class FretboardGeometry:
+   """Pixel layout of a painted fretboard, using the same rows and columns as FretboardGrid"""
+
+   def __init__(self, string_count, fret_count, show_controls=True):
+       self.string_count = string_count
+       self.fret_count = fret_count
+       self.show_controls = show_controls
+
+   def _column_x(self, column):
+       # Column 0 is the string header, column fret + 1 is a fret
+       if column == 0:
+           return 0
+       return HEADER_WIDTH + SPACING + (column - 1) * (CELL_WIDTH + SPACING)
+
+   def _row_y(self, row):
+       # Row 0 is the fret header, row string + 1 is a string
+       if row == 0:
+           return 0
+       return HEADER_HEIGHT + SPACING + (row - 1) * (CELL_HEIGHT + SPACING)
+
+   def corner_rect(self):
+       return QRectF(0, 0, HEADER_WIDTH, HEADER_HEIGHT)
+
+   def fret_header_rect(self, fret):
+       return QRectF(self._column_x(fret + 1), 0, CELL_WIDTH, HEADER_HEIGHT)
+
+   def string_header_rect(self, string_idx):
+       return QRectF(0, self._row_y(string_idx + 1), HEADER_WIDTH, CELL_HEIGHT)
+
+   def cell_rect(self, string_idx, fret):
+       return QRectF(self._column_x(fret + 1), self._row_y(string_idx + 1), CELL_WIDTH, CELL_HEIGHT)
+
+   def control_rects(self):
+       """Rects of the +/- buttons keyed by the FretboardBase method they trigger"""
+       if not self.show_controls:
+           return {}
+       fret_x = self._column_x(self.fret_count + 2)
+       string_y = self._row_y(self.string_count + 1)
+       top = (HEADER_HEIGHT - CONTROL_SIZE) / 2
+       return {
+           "add_fret": QRectF(fret_x, top, CONTROL_SIZE, CONTROL_SIZE),
+           "remove_fret": QRectF(fret_x + CONTROL_SIZE + SPACING * 2, top, CONTROL_SIZE, CONTROL_SIZE),
+           "add_string": QRectF(0, string_y, CONTROL_SIZE, CONTROL_SIZE),
+           "remove_string": QRectF(CONTROL_SIZE + SPACING * 2, string_y, CONTROL_SIZE, CONTROL_SIZE),
+       }
+
+   def visible_cells(self, rect):
+       """(string range, fret range) of the cells intersecting rect, plus one cell of margin"""
+       row_pitch, column_pitch = CELL_HEIGHT + SPACING, CELL_WIDTH + SPACING
+       top, bottom = rect.top() - HEADER_HEIGHT - SPACING, rect.bottom() - HEADER_HEIGHT - SPACING
+       left, right = rect.left() - HEADER_WIDTH - SPACING, rect.right() - HEADER_WIDTH - SPACING
+       strings = range(max(0, int(top // row_pitch) - 1), min(self.string_count, int(bottom // row_pitch) + 2))
+       frets = range(max(0, int(left // column_pitch) - 1), min(self.fret_count + 1, int(right // column_pitch) + 2))
+       return strings, frets
+
+   def size(self):
+       width = self._column_x(self.fret_count + 2)
+       height = self._row_y(self.string_count + 1)
+       if self.show_controls:
+           width += 2 * CONTROL_SIZE + SPACING * 2
+           height += CONTROL_SIZE
+       return QSize(int(width), int(height))
+
+   def hit_test(self, point):
+       """Map a point to ("cell", string, fret), ("string", string), a control name or None"""
+       x, y = point.x(), point.y()
+       for name, rect in self.control_rects().items():
+           if rect.contains(point):
+               return (name,)
+       if y >= HEADER_HEIGHT + SPACING:
+           string_idx, offset_y = divmod(y - HEADER_HEIGHT - SPACING, CELL_HEIGHT + SPACING)
+           string_idx = int(string_idx)
+           if string_idx >= self.string_count or offset_y > CELL_HEIGHT:
+               return None
+           if x < HEADER_WIDTH:
+               return ("string", string_idx)
+           if x >= HEADER_WIDTH + SPACING:
+               fret, offset_x = divmod(x - HEADER_WIDTH - SPACING, CELL_WIDTH + SPACING)
+               fret = int(fret)
+               if fret <= self.fret_count and offset_x <= CELL_WIDTH:
+                   return ("cell", string_idx, fret)
+       return None
+
+
+def make_font(pixel_size, bold=False):
+   font = QFont()
+   font.setPixelSize(pixel_size)
+   font.setBold(bold)
+   return font
+
+
+@lru_cache(maxsize=None)
+def _note_font(bold):
+   return make_font(NOTE_FONT_SIZE, bold)
+
+
+def draw_cell(painter, rect, text, state):
+   """One note cell: outline, rounded background in the state's color and centered text"""
+   painter.setPen(QPen(CELL_BORDER_COLOR, 1))
+   painter.setBrush(Qt.NoBrush)
+   painter.drawRect(rect)
+   inner = rect.adjusted(3, 3, -3, -3)
+   painter.setPen(QPen(CELL_BORDER_COLOR, 2) if state == "highlight" else Qt.NoPen)
+   painter.setBrush(NOTE_COLORS[state])
+   painter.drawRoundedRect(inner, 4, 4)
+   painter.setFont(_note_font(state in ("open", "highlight")))
+   painter.setPen(NOTE_TEXT_COLOR)
+   painter.drawText(inner, Qt.AlignCenter, text)
+
+
+class CellImageCache:
+   """Pre-rendered note cells keyed on (text, state, width, height, device pixel ratio).
+
+   QImage rather than QPixmap so worker threads (exports) can share it with the GUI
+   thread; least recently used images are dropped past max_bytes.
+   """
+
+   def __init__(self, max_bytes=CELL_CACHE_BYTES):
+       self.max_bytes = max_bytes
+       self.size_bytes = 0
+       self.hits = 0
+       self.misses = 0
+       self._images = OrderedDict()
+       self._lock = threading.Lock()
+
+   def __len__(self):
+       return len(self._images)
+
+   def get(self, text, state, width, height, dpr=1.0):
+       key = (text, state, width, height, dpr)
+       with self._lock:
+           image = self._images.get(key)
+           if image is not None:
+               self._images.move_to_end(key)
+               self.hits += 1
+               return image
+           self.misses += 1
+       # Render outside the lock, two threads racing for a key only waste one render
+       image = self._render(text, state, width, height, dpr)
+       with self._lock:
+           if key not in self._images:
+               self._images[key] = image
+               self.size_bytes += image.sizeInBytes()
+               while self.size_bytes > self.max_bytes and len(self._images) > 1:
+                   _, evicted = self._images.popitem(last=False)
+                   self.size_bytes -= evicted.sizeInBytes()
+       return image
+
+   def clear(self):
+       with self._lock:
+           self._images.clear()
+           self.size_bytes = 0
+
+   @staticmethod
+   def _render(text, state, width, height, dpr):
+       padded_width, padded_height = width + 2 * CELL_PADDING, height + 2 * CELL_PADDING
+       image = QImage(round(padded_width * dpr), round(padded_height * dpr), QImage.Format_ARGB32_Premultiplied)
+       image.setDevicePixelRatio(dpr)
+       image.fill(Qt.transparent)
+       painter = QPainter(image)
+       painter.setRenderHint(QPainter.Antialiasing)
+       draw_cell(painter, QRectF(CELL_PADDING, CELL_PADDING, width, height), text, state)
+       painter.end()
+       return image
+
+
+@lru_cache(maxsize=None)
+def get_cell_cache():
+   """CellImageCache shared by every board and raster export in the process"""
+   return CellImageCache()
+
+
+def draw_fretboard(painter, geometry, tuning, note_matrix, states, cell_cache=None, dpr=1.0, visible=None):
+   """Draw headers, note cells and controls; states holds NOTE_STATES indexes from cell_states().
+
+   With a cell_cache the cells are copied from images rendered at dpr, otherwise they are
+   drawn as vector primitives (PDF and SVG output). With a visible rect only the rows and
+   columns intersecting it are drawn, so the cost doesn't grow with the board.
+   """
+   if visible is None:
+       strings, frets = range(geometry.string_count), range(geometry.fret_count + 1)
+   else:
+       strings, frets = geometry.visible_cells(visible)
+   painter.setRenderHint(painter.RenderHint.Antialiasing)
+   header_font = make_font(HEADER_FONT_SIZE, bold=True)
+
+   # --- Header row for fret numbers ---
+   painter.setPen(Qt.NoPen)
+   painter.setBrush(HEADER_COLOR)
+   painter.drawRoundedRect(geometry.corner_rect(), 6, 6)
+   for fret in frets:
+       painter.drawRoundedRect(geometry.fret_header_rect(fret), 6, 6)
+   for string_idx in strings:
+       painter.drawRoundedRect(geometry.string_header_rect(string_idx), 6, 6)
+
+   painter.setFont(header_font)
+   painter.setPen(HEADER_TEXT_COLOR)
+   painter.drawText(geometry.corner_rect(), Qt.AlignCenter, "String/Fret")
+   for fret in frets:
+       painter.drawText(geometry.fret_header_rect(fret), Qt.AlignCenter, str(fret))
+
+   # --- String headers: label plus the tuning "combo" (plain text when printed) ---
+   for string_idx in strings:
+       rect = geometry.string_header_rect(string_idx)
+       if not geometry.show_controls:
+           painter.setPen(HEADER_TEXT_COLOR)
+           painter.drawText(rect.adjusted(6, 0, -10, 0), Qt.AlignRight | Qt.AlignVCenter,
+                            f"String {string_idx + 1}  {tuning[string_idx]}")
+           continue
+       combo_rect = QRectF(rect.right() - 58, rect.top() + 4, 54, rect.height() - 8)
+       painter.setPen(HEADER_TEXT_COLOR)
+       painter.drawText(rect.adjusted(6, 0, -66, 0), Qt.AlignRight | Qt.AlignVCenter, f"String {string_idx + 1}")
+       painter.setPen(QPen(COMBO_BORDER_COLOR, 1))
+       painter.setBrush(COMBO_COLOR)
+       painter.drawRoundedRect(combo_rect, 4, 4)
+       painter.setPen(NOTE_TEXT_COLOR)
+       painter.drawText(combo_rect, Qt.AlignCenter, f"{tuning[string_idx]} ▾")
+
+   # --- Note cells ---
+   padding = QPointF(CELL_PADDING, CELL_PADDING)
+   for string_idx in strings:
+       row_notes = note_matrix[string_idx]
+       for fret in frets:
+           note = row_notes[fret]
+           state = NOTE_STATES[states[string_idx][fret]]
+           rect = geometry.cell_rect(string_idx, fret)
+           if cell_cache is None:
+               draw_cell(painter, rect, note, state)
+           else:
+               painter.drawImage(rect.topLeft() - padding,
+                                 cell_cache.get(note, state, CELL_WIDTH, CELL_HEIGHT, dpr))
+
+   # --- +/- controls ---
+   painter.setFont(header_font)
+   for name, rect in geometry.control_rects().items():
+       painter.setPen(Qt.NoPen)
+       painter.setBrush(BUTTON_COLOR)
+       painter.drawRoundedRect(rect, 6, 6)
+       painter.setPen(NOTE_TEXT_COLOR)
+       painter.drawText(rect, Qt.AlignCenter, "+" if name.startswith("add") else "-")
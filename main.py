@@ -1,295 +1,774 @@
+import time
+_STARTUP_T0 = time.perf_counter()  # Before the Qt imports, for the startup timing report
+
 import sys
+import os
+from bisect import bisect_left
+from contextlib import contextmanager
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QGridLayout, QLabel,
                              QSpinBox, QComboBox, QVBoxLayout, QHBoxLayout, QPushButton,
-                             QCheckBox, QGroupBox, QScrollArea, QFrame, QFileDialog)
-from PySide6.QtCore import Qt, Slot, QDir
-from PySide6.QtGui import QFont, QColor, QPainter
-from PySide6.QtPrintSupport import QPrinter
+                             QCheckBox, QGroupBox, QScrollArea, QFileDialog, QMenu,
+                             QCompleter, QListWidget, QInputDialog, QDoubleSpinBox, QProgressBar)
+from PySide6.QtCore import Qt, Signal, Slot, QDir, QEvent, QObject, QPointF, QRectF, QTimer
+from PySide6.QtGui import QFont, QColor, QPainter, QAction, QKeySequence
 
+import numpy as np
 
-class NoteCalculator:
-   def __init__(self):
-       # Notes in the chromatic scale (using sharps)
-       self.notes = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
-      
-   def get_note_at_fret(self, open_note, fret):
-       """Calculate the note at a specific fret given the open string note"""
-       start_idx = self.notes.index(open_note)
-       note_idx = (start_idx + fret) % len(self.notes)
-       return self.notes[note_idx]
+from chords import CHORD_QUALITIES, VoicingSearch, chord_mask, voicing_label, voicing_positions
+from fretboard_model import (A4_FREQUENCY, DEFAULT_LOWEST_OCTAVE, LABEL_MODES, NOTES, NoteCalculator,
+                            make_snapshot, position_mask)
+from midi import MidiInputStream, PlaybackScheduler, assign_positions, input_port_names, load_midi_file
+from fretboard_painter import (FretboardGeometry, NOTE_STATES, cell_states, draw_fretboard, get_cell_cache,
+                               note_state)
+from positions import DEFAULT_SPAN, PATTERNS, find_positions, position_label
+from scales import get_scale_engine
+from session import SessionHistory, load_session, save_session, session_path
+from tunings import get_tuning_library
+
+_IMPORTS_DONE = time.perf_counter()
+
+
+# Fretboard size limits
+MIN_STRINGS, MAX_STRINGS = 1, 12
+MIN_FRETS, MAX_FRETS = 5, 24
+# The painted board only draws what is on screen, so it can go much further
+PAINTED_MAX_STRINGS, PAINTED_MAX_FRETS = 64, 48
+# Zoom range of the painted board and the factor of one Ctrl+wheel step or zoom action
+MIN_ZOOM, MAX_ZOOM = 0.5, 3.0
+ZOOM_STEP = 1.15
+# Below this the board view doesn't shrink, the window scrolls instead
+BOARD_VIEW_MIN_HEIGHT = 320
+
+# --- Professional, modern color palette ---
+HEADER_STYLE = (
+   "background-color: #232946;"
+   "color: #fffffe;"
+   "font-weight: bold;"
+   "border-radius: 6px;"
+   "padding: 6px;"
+   "font-size: 12pt;"
+   "letter-spacing: 1px;"
+)
+BUTTON_STYLE = (
+   "background-color: #eebbc3;"
+   "color: #232946;"
+   "font-weight: bold;"
+   "border-radius: 6px;"
+   "padding: 4px 10px;"
+   "font-size: 12pt;"
+   "min-width: 32px;"
+   "min-height: 32px;"
+   "border: none;"
+)
+BUTTON_STYLE_HOVER = (
+   "QPushButton:hover {"
+   "background-color: #d4939d;"
+   "color: #fffffe;"
+   "}"
+)
+COMBO_STYLE = (
+   "background-color: #fffffe;"
+   "color: #232946;"
+   "border: 1px solid #b8c1ec;"
+   "border-radius: 4px;"
+   "font-size: 11pt;"
+   "padding: 2px 8px;"
+)
+# Note cell looks, selected through the "noteState" dynamic property of each label
+NOTE_STYLES = {
+   "even": "background-color: #b8c1ec; color: #232946; border-radius: 4px;",
+   "odd": "background-color: #fffffe; color: #232946; border-radius: 4px;",
+   "open": "background-color: #eebbc3; color: #232946; font-weight: bold; border-radius: 4px;",
+   "highlight": "background-color: #f9bc60; color: #232946; font-weight: bold; border-radius: 4px; border: 2px solid #232946;",
+}
+# The margin leaves room for the cell outline FretboardGrid paints behind the labels
+NOTE_STYLESHEET = "".join(
+   f'QLabel[noteState="{state}"] {{ margin: 4px; {style} }}' for state, style in NOTE_STYLES.items()
+)
+CELL_OUTLINE_COLOR = QColor("#000000")
+# Choices of the cell label switch, one per LABEL_MODES entry
+LABEL_MODE_TITLES = {"name": "Note names", "octave": "With octave", "frequency": "Frequency (Hz)"}
+POSITION_PATTERN_TITLES = {"box": "Box", "caged": "CAGED", "3nps": "3 notes per string"}
+
+
+class FretboardBase(QWidget):
+   """Fretboard state and public API shared by the grid and painted renderers"""
+
+   # Emitted after every board update, once per batch
+   state_changed = Signal()
 
+   # Largest board this renderer handles
+   max_strings = MAX_STRINGS
+   max_frets = MAX_FRETS
 
-class FretboardGrid(QWidget):
-   def __init__(self, parent=None):
+   def __init__(self, parent=None, defer_build=False):
        super().__init__(parent)
-       self.layout = QGridLayout()
-       self.layout.setSpacing(3)
-       self.setLayout(self.layout)
-      
+       # With defer_build the cells are only created by the first initialize_grid() call;
+       # changes made before that are kept and applied then
+       self.defer_build = defer_build
+       self._built = False
+
        # Default values
        self.string_count = 6
        self.fret_count = 12
        self.tuning = ["E", "B", "G", "D", "A", "E"]  # Standard guitar tuning
-      
+       # Cell text (one of LABEL_MODES) and the pitch reference octave names and frequencies use
+       self.label_mode = "name"
+       self.lowest_octave = DEFAULT_LOWEST_OCTAVE
+       self.octaves = ()  # Spelled-out octave per string, see open_midi_notes
+       self.a4 = A4_FREQUENCY
+       self.divisions = 12
+
        self.note_calculator = NoteCalculator()
-       self.note_labels = []
        self.highlighted_notes = set()  # Store which notes should be highlighted
-       self.string_tuning_combos = []  # Store references to tuning combo boxes
-       self.note_clicked_callback = None  # Callback for note clicks
-      
-       self.initialize_grid()
+       self.highlighted_positions = set()  # Single (string, fret) cells highlighted on top
+       self.note_clicked_callback = None  # Called with (string, fret, note) on note clicks
+       self._cell_states = np.empty((0, 0), dtype=np.int8)  # Last applied style state per cell
+
+       # Changes waiting for the outermost batch_update() to close
+       self._batch_depth = 0
+       self._pending_dimensions = False
+       self._pending_strings = set()
+       self._pending_highlights = False
+       self._pending_labels = False
+
+   def active_tuning(self):
+       """Open note of every visible string (strings without a tuning default to E)"""
+       tuning = self.tuning[:self.string_count]
+       return tuning + ["E"] * (self.string_count - len(tuning))
+
+   def note_matrix(self):
+       """Note names of every visible cell, note_matrix()[string][fret]"""
+       return self.note_calculator.get_note_matrix(self.active_tuning(), self.fret_count)
+
+   def label_matrix(self):
+       """Text of every visible cell for the current label mode"""
+       return self.note_calculator.get_label_matrix(self.active_tuning(), self.fret_count, self.label_mode,
+                                                    self.lowest_octave, self.a4, self.divisions,
+                                                    self.octaves)
+
+   def pitch_table(self):
+       """Octave-qualified pitch, MIDI number and frequency of every visible cell"""
+       return self.note_calculator.get_pitch_table(self.active_tuning(), self.fret_count,
+                                                   self.lowest_octave, self.a4, self.divisions,
+                                                   self.octaves)
+
+   def cell_states(self):
+       """NOTE_STATES index of every visible cell for the current highlights"""
+       highlighted = self.note_calculator.get_highlight_mask(
+           self.active_tuning(), self.fret_count, self.highlighted_notes)
+       positions = None
+       if self.highlighted_positions:
+           positions = position_mask(highlighted.shape, self.highlighted_positions)
+       return cell_states(highlighted, positions)
+
+   def _diff_cell_states(self):
+       """Store the new cell states and return them with the (string, fret) cells that changed"""
+       states = self.cell_states()
+       previous = self._cell_states
+       if previous.shape != states.shape:
+           # Rows and columns are only added or removed at the end, so the overlap is unchanged
+           resized = np.full(states.shape, -1, dtype=np.int8)
+           rows = min(previous.shape[0], states.shape[0])
+           columns = min(previous.shape[1], states.shape[1])
+           resized[:rows, :columns] = previous[:rows, :columns]
+           previous = resized
+       self._cell_states = states
+       return states, zip(*np.nonzero(states != previous))
+
+   def ensure_built(self):
+       """Create the cells of a board constructed with defer_build"""
+       if not self._built:
+           self.initialize_grid()
+
+   def snapshot(self):
+       """Immutable copy of the board for exporting"""
+       return make_snapshot(self.active_tuning(), self.fret_count, self.highlighted_notes,
+                            self.highlighted_positions)
+
+   def set_note_clicked_callback(self, callback):
+       """callback(string_idx, fret, note) is called when a note cell is clicked"""
+       self.note_clicked_callback = callback
+
+   def _note_clicked(self, string_idx, fret):
+       if self.note_clicked_callback:
+           self.note_clicked_callback(string_idx, fret, self.note_matrix()[string_idx][fret])
+
+   def set_dimensions(self, strings, frets):
+       """Resize the board, only adding or removing the rows and columns that changed"""
+       strings = max(MIN_STRINGS, min(self.max_strings, strings))
+       frets = max(MIN_FRETS, min(self.max_frets, frets))
+       if strings == self.string_count and frets == self.fret_count:
+           return
+       self.string_count = strings
+       self.fret_count = frets
+       if len(self.tuning) < strings:
+           self.tuning.extend(["E"] * (strings - len(self.tuning)))  # Default tuning for new strings
+       self._pending_dimensions = True
+       self._flush_pending()
+
+   def update_tuning(self, string_idx, note):
+       if string_idx < self.string_count and string_idx < len(self.tuning):
+           self.tuning[string_idx] = note
+           self._pending_strings.add(string_idx)
+           self._flush_pending()
+
+   def set_tuning(self, notes):
+       """Retune the whole instrument, adding or removing strings to match, in one board update"""
+       notes = list(notes)[:self.max_strings]
+       with self.batch_update():
+           self.set_dimensions(len(notes), self.fret_count)
+           for string_idx, note in enumerate(notes):
+               if self.tuning[string_idx] != note:
+                   self.update_tuning(string_idx, note)
+
+   def restore(self, snapshot):
+       """Show a snapshot's tuning, size and highlights in one board update"""
+       with self.batch_update():
+           self.set_tuning(snapshot.tuning)
+           self.set_dimensions(len(snapshot.tuning), snapshot.fret_count)
+           self.set_highlighted_notes(snapshot.highlighted_notes)
+           self.set_highlighted_positions(snapshot.highlighted_positions)
+
+   def set_label_mode(self, mode):
+       """Show pitch names, octave-qualified names or frequencies in the cells, without a rebuild"""
+       if mode not in LABEL_MODES:
+           raise ValueError(f"Unknown label mode: {mode}")
+       if mode != self.label_mode:
+           self.label_mode = mode
+           self._pending_labels = True
+           self._flush_pending()
+
+   def set_pitch_reference(self, a4=None, lowest_octave=None, divisions=None, octaves=None):
+       """Change the A4 frequency, the octave of the lowest string, the steps per octave or
+       the spelled-out string octaves"""
+       reference = (self.a4 if a4 is None else a4,
+                    self.lowest_octave if lowest_octave is None else lowest_octave,
+                    self.divisions if divisions is None else divisions,
+                    self.octaves if octaves is None else tuple(octaves))
+       if reference != (self.a4, self.lowest_octave, self.divisions, self.octaves):
+           self.a4, self.lowest_octave, self.divisions, self.octaves = reference
+           self._pending_labels = self.label_mode != "name"
+           self._flush_pending()
+
+   def update_highlighted_notes(self, note, is_selected):
+       if is_selected:
+           self.highlighted_notes.add(note)
+       elif note in self.highlighted_notes:
+           self.highlighted_notes.remove(note)
+       self._pending_highlights = True
+       self._flush_pending()
+
+   def set_highlighted_notes(self, notes):
+       """Replace the highlighted notes and update the board once"""
+       notes = set(notes)
+       if notes != self.highlighted_notes:
+           self.highlighted_notes = notes
+           self._pending_highlights = True
+           self._flush_pending()
+
+   def set_highlighted_positions(self, positions):
+       """Highlight individual (string, fret) cells, e.g. one chord voicing"""
+       positions = set(positions)
+       if positions != self.highlighted_positions:
+           self.highlighted_positions = positions
+           self._pending_highlights = True
+           self._flush_pending()
+
+   @contextmanager
+   def batch_update(self):
+       """Collect every change made inside the block and apply them in one board update"""
+       self._batch_depth += 1
+       try:
+           yield self
+       finally:
+           self._batch_depth -= 1
+           self._flush_pending()
+
+   def _flush_pending(self):
+       if self._batch_depth or not self._built:
+           return
+       if self.label_mode != "name" and (self._pending_dimensions or self._pending_strings):
+           # Octaves are counted up from the lowest string, so other rows' labels can change too
+           self._pending_labels = True
+       if self._pending_dimensions:
+           self._pending_dimensions = False
+           self._apply_dimensions()
+       if self._pending_strings:
+           strings, self._pending_strings = self._pending_strings, set()
+           for string_idx in sorted(strings):
+               if string_idx < self.string_count:
+                   self._apply_tuning(string_idx)
+       if self._pending_labels:
+           self._pending_labels = False
+           self._apply_labels()
+       # Cell states depend on dimensions, tuning and highlights, so any change refreshes them
+       self._pending_highlights = False
+       self._apply_highlights()
+       self.state_changed.emit()
+
+   def add_string(self):
+       """Add a new string to the fretboard"""
+       self.set_dimensions(self.string_count + 1, self.fret_count)
+  
+   def remove_string(self):
+       """Remove the last string from the fretboard"""
+       self.set_dimensions(self.string_count - 1, self.fret_count)
   
+   def add_fret(self):
+       """Add a new fret to the fretboard"""
+       self.set_dimensions(self.string_count, self.fret_count + 1)
+  
+   def remove_fret(self):
+       """Remove the last fret from the fretboard"""
+       self.set_dimensions(self.string_count, self.fret_count - 1)
+
+   # --- Renderer hooks, called once per batch by _flush_pending ---
+   def _apply_dimensions(self):
+       """Show the current string_count x fret_count (cell styles follow in _apply_highlights)"""
+       raise NotImplementedError
+
+   def _apply_tuning(self, string_idx):
+       """Show the notes of a retuned string"""
+       raise NotImplementedError
+
+   def _apply_labels(self):
+       """Show the texts of label_matrix() in every cell"""
+       raise NotImplementedError
+
+   def _apply_highlights(self):
+       """Restyle the cells whose state changed"""
+       raise NotImplementedError
+
+
+class FretboardGrid(FretboardBase):
+   """Fretboard built from one QLabel per cell inside a QGridLayout"""
+
+   def __init__(self, parent=None, defer_build=False):
+       super().__init__(parent, defer_build)
+       self.layout = QGridLayout()
+       self.layout.setSpacing(3)
+       self.setLayout(self.layout)
+       # One shared stylesheet for every note cell instead of a style string per label
+       self.setStyleSheet(NOTE_STYLESHEET)
+       # Cells ignore the mouse; clicks and the hand cursor are handled here with cell_at()
+       self.setMouseTracking(True)
+
+       self.note_labels = []  # note_labels[string][fret]
+       self.fret_labels = []  # Header label for every fret
+       self.string_headers = []  # "String N" + tuning combo container per string
+       self.string_tuning_combos = []  # Store references to tuning combo boxes
+
+       # Released widgets waiting to be reused by the next resize
+       self._cell_pool = []  # Note labels
+       self._fret_label_pool = []
+       self._string_header_pool = []
+
+       self._build_static_widgets()
+       if not defer_build:
+           self.initialize_grid()
+
    def get_note_style(self, fret, note):
        # Professional color scheme logic for dynamic updates
-       note_even = "background-color: #b8c1ec; color: #232946; border-radius: 4px;"
-       note_odd = "background-color: #fffffe; color: #232946; border-radius: 4px;"
-       note_open = "background-color: #eebbc3; color: #232946; font-weight: bold; border-radius: 4px;"
-       note_highlight = "background-color: #f9bc60; color: #232946; font-weight: bold; border-radius: 4px; border: 2px solid #232946;"
-       if fret == 0:
-           return note_open
-       elif note in self.highlighted_notes:
-           return note_highlight
-       elif fret % 2 == 0:
-           return note_even
-       else:
-           return note_odd
+       return NOTE_STYLES[note_state(fret, note in self.highlighted_notes)]
 
-
-   def initialize_grid(self):
-       # Clear existing grid items
-       while self.layout.count():
-           item = self.layout.takeAt(0)
-           widget = item.widget()
-           if widget:
-               widget.deleteLater()
-      
-       self.note_labels = []
-       self.string_tuning_combos = []
-
-
-       # --- Professional, modern color palette ---
-       header_style = (
-           "background-color: #232946;"
-           "color: #fffffe;"
-           "font-weight: bold;"
-           "border-radius: 6px;"
-           "padding: 6px;"
-           "font-size: 12pt;"
-           "letter-spacing: 1px;"
-       )
-       button_style = (
-           "background-color: #eebbc3;"
-           "color: #232946;"
-           "font-weight: bold;"
-           "border-radius: 6px;"
-           "padding: 4px 10px;"
-           "font-size: 12pt;"
-           "min-width: 32px;"
-           "min-height: 32px;"
-           "border: none;"
-       )
-       button_style_hover = (
-           "QPushButton:hover {"
-           "background-color: #d4939d;"
-           "color: #fffffe;"
-           "}"
-       )
-       combo_style = (
-           "background-color: #fffffe;"
-           "color: #232946;"
-           "border: 1px solid #b8c1ec;"
-           "border-radius: 4px;"
-           "font-size: 11pt;"
-           "padding: 2px 8px;"
-       )
-
-
-       # --- Header row for fret numbers ---
+   def _build_static_widgets(self):
+       """Create the widgets that live as long as the grid: corner header and +/- controls"""
        fret_header = QLabel("String/Fret")
-       fret_header.setStyleSheet(header_style)
+       fret_header.setStyleSheet(HEADER_STYLE)
        fret_header.setAlignment(Qt.AlignCenter)
        self.layout.addWidget(fret_header, 0, 0)
 
-
-       for fret in range(self.fret_count + 1):
-           fret_label = QLabel(str(fret))
-           fret_label.setStyleSheet(header_style)
-           fret_label.setAlignment(Qt.AlignCenter)
-           self.layout.addWidget(fret_label, 0, fret + 1)
-
-
        # --- Fret +/- controls (columns) ---
-       fret_control_widget = QWidget()
-       fret_control_layout = QHBoxLayout(fret_control_widget)
+       self.fret_control_widget = QWidget()
+       fret_control_layout = QHBoxLayout(self.fret_control_widget)
        fret_control_layout.setContentsMargins(2, 2, 2, 2)
        fret_control_layout.setSpacing(6)
 
-
        add_fret_btn = QPushButton("+")
-       add_fret_btn.setStyleSheet(button_style + button_style_hover)
+       add_fret_btn.setStyleSheet(BUTTON_STYLE + BUTTON_STYLE_HOVER)
        add_fret_btn.setToolTip("Add fret")
        add_fret_btn.clicked.connect(self.add_fret)
        fret_control_layout.addWidget(add_fret_btn)
 
-
        remove_fret_btn = QPushButton("-")
-       remove_fret_btn.setStyleSheet(button_style + button_style_hover)
+       remove_fret_btn.setStyleSheet(BUTTON_STYLE + BUTTON_STYLE_HOVER)
        remove_fret_btn.setToolTip("Remove fret")
        remove_fret_btn.clicked.connect(self.remove_fret)
        fret_control_layout.addWidget(remove_fret_btn)
 
+       # --- String +/- controls under last string ---
+       self.string_control_widget = QWidget()
+       string_control_layout = QHBoxLayout(self.string_control_widget)
+       string_control_layout.setContentsMargins(2, 2, 2, 2)
+       string_control_layout.setSpacing(6)
 
-       self.layout.addWidget(fret_control_widget, 0, self.fret_count + 2)
+       add_string_btn = QPushButton("+")
+       add_string_btn.setStyleSheet(BUTTON_STYLE + BUTTON_STYLE_HOVER)
+       add_string_btn.setToolTip("Add string")
+       add_string_btn.clicked.connect(self.add_string)
+       string_control_layout.addWidget(add_string_btn)
 
+       remove_string_btn = QPushButton("-")
+       remove_string_btn.setStyleSheet(BUTTON_STYLE + BUTTON_STYLE_HOVER)
+       remove_string_btn.setToolTip("Remove string")
+       remove_string_btn.clicked.connect(self.remove_string)
+       string_control_layout.addWidget(remove_string_btn)
 
-       # --- String rows ---
-       for string_idx in range(self.string_count):
-           string_num = string_idx + 1
+   def initialize_grid(self):
+       """Rebuild every string row and fret column from the current settings"""
+       while self.note_labels:
+           self._remove_string_row()
+       while self.fret_labels:
+           self._remove_fret_column()
+       self._cell_states = np.empty((0, 0), dtype=np.int8)
+       self._built = True
+       self._pending_dimensions = True
+       self._flush_pending()
 
+   def _apply_dimensions(self):
+       # Drop surplus rows first so removed columns don't touch them
+       while len(self.note_labels) > self.string_count:
+           self._remove_string_row()
+       labels = self.label_matrix()
+       while len(self.fret_labels) > self.fret_count + 1:
+           self._remove_fret_column()
+       while len(self.fret_labels) < self.fret_count + 1:
+           self._add_fret_column(labels)
+       while len(self.note_labels) < self.string_count:
+           self._add_string_row(labels)
 
-           string_container = QWidget()
-           string_layout = QHBoxLayout(string_container)
-           string_layout.setContentsMargins(2, 2, 2, 2)
-           string_layout.setSpacing(6)
+       # Keep the +/- controls just past the last column and under the last string
+       self.layout.removeWidget(self.fret_control_widget)
+       self.layout.addWidget(self.fret_control_widget, 0, self.fret_count + 2)
+       self.layout.removeWidget(self.string_control_widget)
+       self.layout.addWidget(self.string_control_widget, self.string_count + 1, 0)
 
+   def _add_string_row(self, labels):
+       string_idx = len(self.note_labels)
+       if self._string_header_pool:
+           string_container = self._string_header_pool.pop()
+       else:
+           string_container = self._create_string_header()
+       string_container.string_label.setText(f"String {string_idx + 1}")
+       tuning_combo = string_container.tuning_combo
+       tuning_combo.string_idx = string_idx
+       tuning_combo.blockSignals(True)
+       tuning_combo.setCurrentText(self.active_tuning()[string_idx])
+       tuning_combo.blockSignals(False)
+       self.layout.addWidget(string_container, string_idx + 1, 0)
+       string_container.show()
+       self.string_headers.append(string_container)
+       self.string_tuning_combos.append(tuning_combo)
 
-           string_label = QLabel(f"String {string_num}")
-           string_label.setStyleSheet(header_style)
-           string_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
-           string_layout.addWidget(string_label)
+       string_notes = []
+       for fret, label in enumerate(labels[string_idx]):
+           note_label = self._acquire_cell(label)
+           self.layout.addWidget(note_label, string_idx + 1, fret + 1)
+           note_label.show()
+           string_notes.append(note_label)
+       self.note_labels.append(string_notes)
 
+   def _remove_string_row(self):
+       string_container = self.string_headers.pop()
+       self.string_tuning_combos.pop()
+       self.layout.removeWidget(string_container)
+       string_container.hide()
+       self._string_header_pool.append(string_container)
+       for note_label in self.note_labels.pop():
+           self._release_cell(note_label)
 
-           tuning_combo = QComboBox()
-           tuning_combo.addItems(["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"])
-           tuning = self.tuning[string_idx] if string_idx < len(self.tuning) else "E"
-           tuning_combo.setCurrentText(tuning)
-           tuning_combo.setStyleSheet(combo_style)
-           tuning_combo.currentTextChanged.connect(lambda note, idx=string_idx: self.update_tuning(idx, note))
-           string_layout.addWidget(tuning_combo)
+   def _add_fret_column(self, labels):
+       fret = len(self.fret_labels)
+       if self._fret_label_pool:
+           fret_label = self._fret_label_pool.pop()
+           fret_label.setText(str(fret))
+       else:
+           fret_label = QLabel(str(fret))
+           fret_label.setStyleSheet(HEADER_STYLE)
+           fret_label.setAlignment(Qt.AlignCenter)
+       self.layout.addWidget(fret_label, 0, fret + 1)
+       fret_label.show()
+       self.fret_labels.append(fret_label)
 
+       for string_idx in range(len(self.note_labels)):
+           note_label = self._acquire_cell(labels[string_idx][fret])
+           self.layout.addWidget(note_label, string_idx + 1, fret + 1)
+           note_label.show()
+           self.note_labels[string_idx].append(note_label)
 
-           self.string_tuning_combos.append(tuning_combo)
-           self.layout.addWidget(string_container, string_idx + 1, 0)
+   def _remove_fret_column(self):
+       fret_label = self.fret_labels.pop()
+       self.layout.removeWidget(fret_label)
+       fret_label.hide()
+       self._fret_label_pool.append(fret_label)
+       for string_notes in self.note_labels:
+           self._release_cell(string_notes.pop())
 
+   def _create_string_header(self):
+       string_container = QWidget()
+       string_layout = QHBoxLayout(string_container)
+       string_layout.setContentsMargins(2, 2, 2, 2)
+       string_layout.setSpacing(6)
 
-           string_notes = []
-           for fret in range(self.fret_count + 1):
-               if string_idx < len(self.tuning):
-                   note = self.note_calculator.get_note_at_fret(self.tuning[string_idx], fret)
-               else:
-                   note = self.note_calculator.get_note_at_fret("E", fret)
+       string_label = QLabel()
+       string_label.setStyleSheet(HEADER_STYLE)
+       string_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+       string_layout.addWidget(string_label)
 
+       tuning_combo = QComboBox()
+       tuning_combo.addItems(NOTES)
+       tuning_combo.setStyleSheet(COMBO_STYLE)
+       # The row index is read at signal time because pooled headers move between rows
+       tuning_combo.currentTextChanged.connect(
+           lambda note, combo=tuning_combo: self.update_tuning(combo.string_idx, note))
+       string_layout.addWidget(tuning_combo)
 
-               note_frame = QFrame()
-               note_frame.setFrameStyle(QFrame.Box | QFrame.Plain)
-               note_frame.setLineWidth(1)
-               note_layout = QVBoxLayout(note_frame)
-               note_layout.setContentsMargins(3, 3, 3, 3)
-               note_layout.setSpacing(0)
+       string_container.string_label = string_label
+       string_container.tuning_combo = tuning_combo
+       return string_container
 
+   def _acquire_cell(self, text):
+       """Take a note cell from the pool (or build one) showing text; its style is set by _refresh_cells"""
+       if self._cell_pool:
+           note_label = self._cell_pool.pop()
+       else:
+           note_label = QLabel()
+           note_label.setAlignment(Qt.AlignCenter)
+           note_label.setMinimumWidth(43)
+           note_label.setMinimumHeight(33)
+           note_label.setAttribute(Qt.WA_TransparentForMouseEvents)
+       note_label.setText(text)
+       return note_label
 
-               note_label = QLabel(note)
-               note_label.setAlignment(Qt.AlignCenter)
-               note_label.setMinimumWidth(35)
-               note_label.setMinimumHeight(25)
-               note_label.setStyleSheet(self.get_note_style(fret, note))
-               note_layout.addWidget(note_label)
-               self.layout.addWidget(note_frame, string_idx + 1, fret + 1)
-               string_notes.append(note_label)
-               # --- Make note clickable ---
-               note_label.setCursor(Qt.PointingHandCursor)
-               note_label.mousePressEvent = self._make_note_click_handler(note)
-           self.note_labels.append(string_notes)
+   def _release_cell(self, note_label):
+       self.layout.removeWidget(note_label)
+       note_label.hide()
+       self._cell_pool.append(note_label)
 
+   def _apply_tuning(self, string_idx):
+       note = self.tuning[string_idx]
+       combo = self.string_tuning_combos[string_idx]
+       if combo.currentText() != note:
+           combo.blockSignals(True)
+           combo.setCurrentText(note)
+           combo.blockSignals(False)
+       if self.label_mode != "name":
+           return  # Every row is relabelled by _apply_labels
+       row_notes = self.note_calculator.get_note_matrix([note], self.fret_count)[0]
+       for fret, note_at_fret in enumerate(row_notes):
+           self.note_labels[string_idx][fret].setText(note_at_fret)
 
-       # --- String +/- controls under last string ---
-       string_control_widget = QWidget()
-       string_control_layout = QHBoxLayout(string_control_widget)
-       string_control_layout.setContentsMargins(2, 2, 2, 2)
-       string_control_layout.setSpacing(6)
+   def _apply_labels(self):
+       for string_notes, row_labels in zip(self.note_labels, self.label_matrix()):
+           for note_label, label in zip(string_notes, row_labels):
+               if note_label.text() != label:
+                   note_label.setText(label)
 
+   def _apply_highlights(self):
+       self._refresh_cells()
 
-       add_string_btn = QPushButton("+")
-       add_string_btn.setStyleSheet(button_style + button_style_hover)
-       add_string_btn.setToolTip("Add string")
-       add_string_btn.clicked.connect(self.add_string)
-       string_control_layout.addWidget(add_string_btn)
+   def _refresh_cells(self):
+       """Restyle only the cells whose style state changed since the last refresh"""
+       states, changed = self._diff_cell_states()
+       for string_idx, fret in changed:
+           note_label = self.note_labels[string_idx][fret]
+           note_label.setProperty("noteState", NOTE_STATES[states[string_idx, fret]])
+           # Dynamic property changes need a re-polish to pick up the new rule
+           note_label.style().unpolish(note_label)
+           note_label.style().polish(note_label)
 
+   def paintEvent(self, event):
+       # One outline per cell, drawn here instead of wrapping every label in a QFrame
+       if not self.note_labels:
+           return
+       painter = QPainter(self)
+       painter.setPen(CELL_OUTLINE_COLOR)
+       painter.drawRects([note_label.geometry().adjusted(0, 0, -1, -1)
+                          for string_notes in self.note_labels for note_label in string_notes])
+       painter.end()
 
-       remove_string_btn = QPushButton("-")
-       remove_string_btn.setStyleSheet(button_style + button_style_hover)
-       remove_string_btn.setToolTip("Remove string")
-       remove_string_btn.clicked.connect(self.remove_string)
-       string_control_layout.addWidget(remove_string_btn)
+   def cell_at(self, pos):
+       """(string, fret) of the note cell under pos, or None"""
+       if not self.note_labels or not self.note_labels[0]:
+           return None
+       # Cells are laid out in rows 1.. and columns 1.., bisect the row/column extents
+       x, y = pos.x(), pos.y()
+       fret_rights = [self.layout.cellRect(1, fret + 1).right() for fret in range(len(self.note_labels[0]))]
+       string_bottoms = [self.layout.cellRect(string_idx + 1, 1).bottom()
+                         for string_idx in range(len(self.note_labels))]
+       fret = bisect_left(fret_rights, x)
+       string_idx = bisect_left(string_bottoms, y)
+       if fret == len(fret_rights) or string_idx == len(string_bottoms):
+           return None
+       if not self.note_labels[string_idx][fret].geometry().contains(pos):
+           return None  # In the spacing between cells
+       return string_idx, fret
 
+   def mousePressEvent(self, event):
+       cell = self.cell_at(event.position().toPoint())
+       if cell is None:
+           return super().mousePressEvent(event)
+       self._note_clicked(*cell)
 
-       self.layout.addWidget(string_control_widget, self.string_count + 1, 0)
-  
-   def set_note_clicked_callback(self, callback):
-       self.note_clicked_callback = callback
+   def mouseMoveEvent(self, event):
+       over_cell = self.cell_at(event.position().toPoint()) is not None
+       if over_cell != (self.cursor().shape() == Qt.PointingHandCursor):
+           if over_cell:
+               self.setCursor(Qt.PointingHandCursor)
+           else:
+               self.unsetCursor()
+       super().mouseMoveEvent(event)
 
 
-   def update_tuning(self, string_idx, note):
-       if string_idx < self.string_count and string_idx < len(self.tuning):
-           self.tuning[string_idx] = note
-           if string_idx < len(self.string_tuning_combos):
-               combo = self.string_tuning_combos[string_idx]
-               if combo.currentText() != note:
-                   combo.setCurrentText(note)
-           for fret in range(self.fret_count + 1):
-               note_at_fret = self.note_calculator.get_note_at_fret(note, fret)
-               self.note_labels[string_idx][fret].setText(note_at_fret)
-               # Use dynamic color scheme
-               self.note_labels[string_idx][fret].setStyleSheet(self.get_note_style(fret, note_at_fret))
+class PaintedFretboard(FretboardBase):
+   """Fretboard drawn in a single paintEvent, with hit-testing instead of per-cell widgets.
 
+   Only the cells inside the exposed rect are drawn, so inside a scroll area the cost of a
+   frame depends on the viewport, not on the size of the board.
+   """
 
-   def update_highlighted_notes(self, note, is_selected):
-       if is_selected:
-           self.highlighted_notes.add(note)
-       elif note in self.highlighted_notes:
-           self.highlighted_notes.remove(note)
-       for string_idx in range(self.string_count):
-           for fret in range(self.fret_count + 1):
-               note_at_fret = self.note_labels[string_idx][fret].text()
-               self.note_labels[string_idx][fret].setStyleSheet(self.get_note_style(fret, note_at_fret))
+   max_strings = PAINTED_MAX_STRINGS
+   max_frets = PAINTED_MAX_FRETS
 
+   zoom_changed = Signal(float)
 
-   def add_string(self):
-       """Add a new string to the fretboard"""
-       if self.string_count < 12:  # Maximum limit
-           self.string_count += 1
-           self.tuning.append("E")  # Default tuning for new string
-           self.initialize_grid()
-  
-   def remove_string(self):
-       """Remove the last string from the fretboard"""
-       if self.string_count > 1:  # Minimum limit
-           self.string_count -= 1
-           self.initialize_grid()
-  
-   def add_fret(self):
-       """Add a new fret to the fretboard"""
-       if self.fret_count < 24:  # Maximum limit
-           self.fret_count += 1
-           self.initialize_grid()
-  
-   def remove_fret(self):
-       """Remove the last fret from the fretboard"""
-       if self.fret_count > 5:  # Minimum limit
-           self.fret_count -= 1
+   def __init__(self, parent=None, defer_build=False):
+       super().__init__(parent, defer_build)
+       self.geometry_model = FretboardGeometry(self.string_count, self.fret_count)
+       self.zoom = 1.0
+       self.setCursor(Qt.PointingHandCursor)
+       if not defer_build:
            self.initialize_grid()
 
+   def initialize_grid(self):
+       """Recompute the layout and repaint the whole board"""
+       self._built = True
+       self._pending_dimensions = True
+       self._flush_pending()
+
+   def sizeHint(self):
+       return self.geometry_model.size() * self.zoom
+
+   def minimumSizeHint(self):
+       return self.sizeHint()
+
+   def set_zoom(self, zoom, anchor=None):
+       """Scale the board; with an anchor (widget point) that point stays put in the enclosing scroll area"""
+       zoom = max(MIN_ZOOM, min(MAX_ZOOM, zoom))
+       if zoom == self.zoom:
+           return
+       scroll_area = self._scroll_area()
+       if anchor is not None and scroll_area is not None:
+           viewport_pos = self.mapTo(scroll_area.viewport(), anchor)
+           board_pos = QPointF(anchor) / self.zoom
+       self.zoom = zoom
+       self.setMinimumSize(self.sizeHint())
+       self.updateGeometry()
+       self.update()
+       self.zoom_changed.emit(zoom)
+       if anchor is not None and scroll_area is not None:
+           # Let the layouts and the scroll area take the new size before moving the scroll bars
+           QApplication.sendPostedEvents(None, QEvent.LayoutRequest)
+           target = self.mapTo(scroll_area.widget(), (board_pos * zoom).toPoint())
+           scroll_area.horizontalScrollBar().setValue(target.x() - viewport_pos.x())
+           scroll_area.verticalScrollBar().setValue(target.y() - viewport_pos.y())
+
+   def _scroll_area(self):
+       widget = self.parentWidget()
+       while widget is not None and not isinstance(widget, QScrollArea):
+           widget = widget.parentWidget()
+       return widget
+
+   def _widget_rect(self, rect):
+       """Widget pixels covered by a board rect at the current zoom, with room for antialiasing"""
+       return QRectF(rect.topLeft() * self.zoom, rect.size() * self.zoom).toAlignedRect().adjusted(-1, -1, 1, 1)
+
+   def paintEvent(self, event):
+       if not self._built:
+           return
+       painter = QPainter(self)
+       painter.scale(self.zoom, self.zoom)
+       visible = QRectF(QRectF(event.rect()).topLeft() / self.zoom, QRectF(event.rect()).size() / self.zoom)
+       # Cells are copied from the image cache shared with other boards and PNG exports,
+       # rendered at the zoomed resolution so they stay sharp
+       draw_fretboard(painter, self.geometry_model, self.active_tuning(), self.label_matrix(),
+                      self._cell_states, get_cell_cache(), self.devicePixelRatioF() * self.zoom, visible)
+       painter.end()
+
+   def wheelEvent(self, event):
+       if not event.modifiers() & Qt.ControlModifier:
+           return super().wheelEvent(event)
+       steps = event.angleDelta().y() / 120
+       self.set_zoom(self.zoom * ZOOM_STEP ** steps, event.position().toPoint())
+       event.accept()
+
+   def mousePressEvent(self, event):
+       hit = self.geometry_model.hit_test(event.position() / self.zoom)
+       if hit is None:
+           return super().mousePressEvent(event)
+       if hit[0] == "cell":
+           self._note_clicked(hit[1], hit[2])
+       elif hit[0] == "string":
+           self._show_tuning_menu(hit[1], event.globalPosition().toPoint())
+       else:
+           # +/- controls are named after the method they call
+           getattr(self, hit[0])()
+
+   def _show_tuning_menu(self, string_idx, global_pos):
+       menu = QMenu(self)
+       for note in NOTES:
+           action = menu.addAction(note)
+           action.setCheckable(True)
+           action.setChecked(note == self.tuning[string_idx])
+       chosen = menu.exec(global_pos)
+       if chosen is not None:
+           self.update_tuning(string_idx, chosen.text())
+
+   def _apply_dimensions(self):
+       self.geometry_model = FretboardGeometry(self.string_count, self.fret_count)
+       self._cell_states = self.cell_states()
+       self.setMinimumSize(self.sizeHint())
+       self.updateGeometry()
+       self.update()
+
+   def _apply_tuning(self, string_idx):
+       # Every note of the row changes, other rows only where their highlight changed
+       rect = self.geometry_model.string_header_rect(string_idx)
+       rect = rect.united(self.geometry_model.cell_rect(string_idx, self.fret_count))
+       self.update(self._widget_rect(rect))
+
+   def _apply_labels(self):
+       self.update()
+
+   def _apply_highlights(self):
+       _, changed = self._diff_cell_states()
+       for string_idx, fret in changed:
+           self.update(self._widget_rect(self.geometry_model.cell_rect(string_idx, fret)))
+
 
-   def _make_note_click_handler(self, note):
-       def handler(event):
-           if self.note_clicked_callback:
-               self.note_clicked_callback(note)
-       return handler
+# Fretboard backends selectable from the command line
+FRETBOARD_RENDERERS = {
+   "grid": FretboardGrid,
+   "painted": PaintedFretboard,
+}
 
 
 class MainWindow(QMainWindow):
-   def __init__(self):
+   # Emitted from the voicing search thread: (search, voicings or None if cancelled)
+   voicings_found = Signal(object, object)
+   # Emitted from the pitch detection thread: (stream, note name or None), (stream)
+   pitch_detected = Signal(object, object)
+   pitch_finished = Signal(object)
+   # Emitted from the export thread: (job, pages done, pages), (job)
+   export_progress = Signal(object, int, int)
+   export_finished = Signal(object)
+
+   def __init__(self, renderer="grid", startup_timer=None, session_file=None):
        super().__init__()
+       self.renderer = renderer
+       self.startup_timer = startup_timer
+       self.session_file = session_file
       
        self.setWindowTitle("Notez - String Instrument Visualizer")
        self.setMinimumSize(900, 600)
@@ -365,6 +844,7 @@ class MainWindow(QMainWindow):
        self.layout.setContentsMargins(15, 15, 15, 15)
       
        self.setup_ui()
+       self.setup_history()
   
    def setup_ui(self):
        # Create title container with export button
@@ -376,7 +856,7 @@ class MainWindow(QMainWindow):
        title_container.addWidget(title_label)
       
        # Add export button
-       export_button = QPushButton("Export as PDF")
+       export_button = QPushButton("Export as PDF/SVG")
        export_button.setStyleSheet("""
            QPushButton {
                background-color: #27ae60;
@@ -390,8 +870,49 @@ class MainWindow(QMainWindow):
                background-color: #219a52;
            }
        """)
-       export_button.clicked.connect(self.export_to_pdf)
+       export_button.clicked.connect(lambda: self.export_to_pdf())
        title_container.addWidget(export_button)
+
+       # Exports run in the background, one after another
+       self.export_queue = None
+       self.export_progress_bar = QProgressBar()
+       self.export_progress_bar.setMaximumWidth(160)
+       self.export_progress_bar.setTextVisible(False)
+       self.export_progress_bar.hide()
+       title_container.addWidget(self.export_progress_bar)
+       self.export_status_label = QLabel()
+       self.export_status_label.setStyleSheet("color: #2c3e50;")
+       title_container.addWidget(self.export_status_label)
+       self.export_cancel_button = QPushButton("Cancel Export")
+       self.export_cancel_button.clicked.connect(self.cancel_exports)
+       self.export_cancel_button.hide()
+       title_container.addWidget(self.export_cancel_button)
+       self.export_progress.connect(self.handle_export_progress)
+       self.export_finished.connect(self.handle_export_finished)
+
+       # Undo/redo of board changes, also on the standard shortcuts
+       self.undo_action = QAction("Undo", self)
+       self.undo_action.setShortcut(QKeySequence.Undo)
+       self.undo_action.triggered.connect(self.undo)
+       self.addAction(self.undo_action)
+       self.redo_action = QAction("Redo", self)
+       self.redo_action.setShortcut(QKeySequence.Redo)
+       self.redo_action.triggered.connect(self.redo)
+       self.addAction(self.redo_action)
+       for action in (self.undo_action, self.redo_action):
+           history_button = QPushButton(action.text())
+           history_button.clicked.connect(action.trigger)
+           action.enabledChanged.connect(history_button.setEnabled)
+           title_container.addWidget(history_button)
+
+       # Zoom of the painted boards (Ctrl+wheel over a board zooms around the cursor)
+       for text, shortcut, factor in (("Zoom In", QKeySequence.ZoomIn, ZOOM_STEP),
+                                      ("Zoom Out", QKeySequence.ZoomOut, 1 / ZOOM_STEP),
+                                      ("Reset Zoom", QKeySequence("Ctrl+0"), None)):
+           zoom_action = QAction(text, self)
+           zoom_action.setShortcut(shortcut)
+           zoom_action.triggered.connect(lambda _=False, factor=factor: self.zoom_boards(factor))
+           self.addAction(zoom_action)
       
        self.layout.addLayout(title_container)
       
@@ -407,11 +928,21 @@ class MainWindow(QMainWindow):
        preset_label = QLabel("Scale Presets:")
        preset_label.setStyleSheet("color: #ffffff; font-weight: bold;")
        preset_layout.addWidget(preset_label)
+       self.scale_engine = get_scale_engine()
        self.preset_combo = QComboBox()
-       self.preset_combo.addItems([
-           "Select a scale...", "C Major", "A Minor", "G Major", "E Minor", "F Major", "D Minor"
-       ])
-       self.preset_combo.currentTextChanged.connect(self.handle_preset_change)
+       self.preset_combo.addItems(self.scale_engine.names)
+       # Editable so the few hundred generated scales can be filtered by typing
+       self.preset_combo.setEditable(True)
+       self.preset_combo.setInsertPolicy(QComboBox.NoInsert)
+       self.preset_combo.lineEdit().setPlaceholderText("Select a scale...")
+       self.preset_combo.setCurrentIndex(-1)
+       preset_completer = QCompleter(self.scale_engine.names, self.preset_combo)
+       preset_completer.setFilterMode(Qt.MatchContains)
+       preset_completer.setCaseSensitivity(Qt.CaseInsensitive)
+       preset_completer.setCompletionMode(QCompleter.PopupCompletion)
+       self.preset_combo.setCompleter(preset_completer)
+       # Picking a completion activates the combo too, so this one signal covers both
+       self.preset_combo.textActivated.connect(self.handle_preset_change)
        self.preset_combo.setStyleSheet("""
            QComboBox {
                background-color: #2980b9;
@@ -441,7 +972,7 @@ class MainWindow(QMainWindow):
        notes_layout = QGridLayout()
        notes_layout.setSpacing(5)
        self.note_checkboxes = {}
-       notes = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+       notes = NOTES
       
        # Arrange checkboxes in a 2x6 grid
        for i, note in enumerate(notes):
@@ -452,48 +983,642 @@ class MainWindow(QMainWindow):
            self.note_checkboxes[note] = checkbox
       
        highlight_layout.addLayout(notes_layout)
+
+       # Scales that contain every highlighted note
+       self.matching_scales_label = QLabel()
+       self.matching_scales_label.setWordWrap(True)
+       highlight_layout.addWidget(self.matching_scales_label)
       
        config_section.addWidget(highlight_group, 1)
+       config_section.addWidget(self.create_chord_group())
+       config_section.addWidget(self.create_positions_group())
        self.layout.addLayout(config_section)
       
        # Create the fretboard visualization
-       self.fretboard = FretboardGrid()
+       # The cells are built once the window is on screen, see showEvent
+       self.fretboard = FRETBOARD_RENDERERS[self.renderer](defer_build=True)
        self.fretboard.set_note_clicked_callback(self.handle_note_clicked)
-       fretboard_wrapper = QVBoxLayout()
-       fretboard_wrapper.addWidget(self.fretboard)
-       self.layout.addLayout(fretboard_wrapper)
-       self.layout.addStretch(1)
+       self.layout.addLayout(self.create_tuning_controls())
+       self.layout.addLayout(self.create_midi_controls())
+       # The boards get their own viewport so wide or stacked boards scroll on their own,
+       # and the painted board only draws the part of it that is visible
+       board_container = QWidget()
+       self.fretboard_wrapper = QVBoxLayout(board_container)
+       self.fretboard_wrapper.setContentsMargins(0, 0, 0, 0)
+       self.fretboard_wrapper.addWidget(self.fretboard)
+       self.fretboard_wrapper.addStretch(1)
+       self.board_scroll = QScrollArea()
+       self.board_scroll.setWidgetResizable(True)
+       self.board_scroll.setFrameShape(QScrollArea.NoFrame)
+       self.board_scroll.setMinimumHeight(BOARD_VIEW_MIN_HEIGHT)
+       self.board_scroll.setWidget(board_container)
+       self.layout.addWidget(self.board_scroll, 1)
+
+       # Extra instruments shown under the main board with the same highlights
+       self.stacked_boards = []
+       self.fretboard.state_changed.connect(self.sync_stacked_boards)
+       self.fretboard.state_changed.connect(self.update_positions_for_board)
+       if isinstance(self.fretboard, PaintedFretboard):
+           self.fretboard.zoom_changed.connect(self.sync_stacked_boards)
   
+   def setup_history(self):
+       """Restore the saved session, if any, and start recording board changes"""
+       self.history = None
+       if self.session_file and os.path.exists(self.session_file):
+           try:
+               self.history = load_session(self.session_file)
+           except (OSError, ValueError) as e:
+               print(f"warning: could not restore session: {e}", file=sys.stderr)
+       if self.history is not None:
+           # The board isn't built yet, so this only sets its state for the first build
+           self.restore_snapshot(self.history.current)
+       else:
+           self.history = SessionHistory(self.fretboard.snapshot())
+       self.fretboard.state_changed.connect(self.record_history)
+       self.update_history_actions()
+
+   def record_history(self):
+       if self.midi_scheduler is not None or self.pitch_stream is not None:
+           return  # Playback changes the board every frame, only its end result is recorded
+       if self.history.record(self.fretboard.snapshot()):
+           self.update_history_actions()
+
+   def update_history_actions(self):
+       self.undo_action.setEnabled(self.history.can_undo())
+       self.redo_action.setEnabled(self.history.can_redo())
+
+   def restore_snapshot(self, snapshot):
+       """Put the board and the controls in the state of snapshot with one board update"""
+       tuning = self.tuning_library.find(snapshot.tuning)
+       with self.fretboard.batch_update():
+           self.fretboard.restore(snapshot)
+           self.set_highlighted_notes(snapshot.highlighted_notes)
+           if tuning is not None:
+               self.fretboard.set_pitch_reference(lowest_octave=tuning.lowest_octave, octaves=tuning.octaves)
+           else:
+               self.fretboard.set_pitch_reference(octaves=())
+       self.tuning_combo.setCurrentIndex(self.tuning_combo.findData(tuning.name) if tuning else -1)
+
+   @Slot()
+   def undo(self):
+       snapshot = self.history.undo()
+       if snapshot is not None:
+           self.restore_snapshot(snapshot)
+       self.update_history_actions()
+
+   @Slot()
+   def redo(self):
+       snapshot = self.history.redo()
+       if snapshot is not None:
+           self.restore_snapshot(snapshot)
+       self.update_history_actions()
+
+   def closeEvent(self, event):
+       self.stop_midi()
+       self.stop_pitch_detection()
+       if self.export_queue is not None and (self.export_queue.current or self.export_queue.queued()):
+           print("warning: cancelled unfinished exports", file=sys.stderr)
+           self.cancel_exports()
+       if self.session_file:
+           try:
+               save_session(self.session_file, self.history)
+           except OSError as e:
+               print(f"warning: could not save session: {e}", file=sys.stderr)
+       super().closeEvent(event)
+
+   def create_tuning_controls(self):
+       """Quick switch between the tunings of the tuning library"""
+       tuning_layout = QHBoxLayout()
+       tuning_label = QLabel("Tuning:")
+       tuning_label.setStyleSheet("color: #2c3e50; font-weight: bold;")
+       tuning_layout.addWidget(tuning_label)
+
+       self.tuning_library = get_tuning_library()
+       self.tuning_combo = QComboBox()
+       for instrument in self.tuning_library.instruments():
+           if self.tuning_combo.count():
+               self.tuning_combo.insertSeparator(self.tuning_combo.count())
+           for tuning in self.tuning_library.for_instrument(instrument):
+               self.tuning_combo.addItem(tuning.name, tuning.name)
+       self.tuning_combo.setCurrentIndex(self.tuning_combo.findData("Guitar: Standard"))
+       self.tuning_combo.activated.connect(self.handle_tuning_change)
+       tuning_layout.addWidget(self.tuning_combo)
+
+       # What the cells show; switching only relabels them
+       labels_label = QLabel("Show:")
+       labels_label.setStyleSheet("color: #2c3e50; font-weight: bold;")
+       tuning_layout.addWidget(labels_label)
+       self.label_mode_combo = QComboBox()
+       for mode in LABEL_MODES:
+           self.label_mode_combo.addItem(LABEL_MODE_TITLES[mode], mode)
+       self.label_mode_combo.currentIndexChanged.connect(
+           lambda index: self.fretboard.set_label_mode(self.label_mode_combo.itemData(index)))
+       tuning_layout.addWidget(self.label_mode_combo)
+       a4_label = QLabel("A4:")
+       a4_label.setStyleSheet("color: #2c3e50; font-weight: bold;")
+       tuning_layout.addWidget(a4_label)
+       self.a4_spin = QDoubleSpinBox()
+       self.a4_spin.setRange(400.0, 480.0)
+       self.a4_spin.setDecimals(1)
+       self.a4_spin.setSuffix(" Hz")
+       self.a4_spin.setValue(A4_FREQUENCY)
+       self.a4_spin.valueChanged.connect(lambda a4: self.fretboard.set_pitch_reference(a4=a4))
+       tuning_layout.addWidget(self.a4_spin)
+       stack_button = QPushButton("Stack Instrument...")
+       stack_button.setToolTip("Show another instrument under this one with the same highlighted notes")
+       stack_button.clicked.connect(lambda: self.add_stacked_instrument())
+       tuning_layout.addWidget(stack_button)
+       tuning_layout.addStretch()
+       return tuning_layout
+
+   def handle_tuning_change(self, index):
+       tuning = self.tuning_library.get(self.tuning_combo.itemData(index))
+       if tuning is not None:
+           with self.fretboard.batch_update():
+               self.fretboard.set_tuning(tuning.notes)
+               self.fretboard.set_pitch_reference(lowest_octave=tuning.lowest_octave, octaves=tuning.octaves)
+
+   def add_stacked_instrument(self, tuning_name=None):
+       """Stack a board in another library tuning under the main one; it follows the main board's highlights"""
+       if tuning_name is None:
+           tuning_name, ok = QInputDialog.getItem(self, "Stack Instrument", "Tuning:",
+                                                  self.tuning_library.names, 0, False)
+           if not ok:
+               return None
+       tuning = self.tuning_library.get(tuning_name)
+       if tuning is None:
+           return None
+
+       container = QWidget()
+       container_layout = QVBoxLayout(container)
+       container_layout.setContentsMargins(0, 0, 0, 0)
+       header_layout = QHBoxLayout()
+       name_label = QLabel(tuning.name)
+       name_label.setStyleSheet("color: #2c3e50; font-weight: bold;")
+       header_layout.addWidget(name_label)
+       remove_button = QPushButton("Remove")
+       header_layout.addWidget(remove_button)
+       header_layout.addStretch()
+       container_layout.addLayout(header_layout)
+
+       board = FRETBOARD_RENDERERS[self.renderer](defer_build=True)
+       board.set_note_clicked_callback(self.handle_note_clicked)
+       if isinstance(board, PaintedFretboard):
+           # Zooming any board zooms them all
+           board.zoom_changed.connect(self.fretboard.set_zoom)
+       with board.batch_update():
+           board.set_tuning(tuning.notes)
+           board.set_pitch_reference(lowest_octave=tuning.lowest_octave, octaves=tuning.octaves)
+       container_layout.addWidget(board)
+       container.board = board
+       remove_button.clicked.connect(lambda: self.remove_stacked_instrument(container))
+       # Above the stretch that keeps the boards at the top of the view
+       self.fretboard_wrapper.insertWidget(self.fretboard_wrapper.count() - 1, container)
+       self.stacked_boards.append(container)
+       self.sync_stacked_boards()
+       board.ensure_built()
+       return board
+
+   def remove_stacked_instrument(self, container):
+       self.stacked_boards.remove(container)
+       self.fretboard_wrapper.removeWidget(container)
+       container.deleteLater()
+
+   def sync_stacked_boards(self):
+       """Give the stacked boards the main board's fret count, highlighted notes, labels and zoom.
+
+       Single highlighted cells (a voicing or scale position) show up on every stacked cell
+       that plays the same pitch.
+       """
+       main = self.fretboard
+       pitches = []
+       if main.highlighted_positions:
+           midi = main.pitch_table().midi
+           pitches = sorted({int(midi[string_idx, fret]) for string_idx, fret in main.highlighted_positions})
+       for container in self.stacked_boards:
+           board = container.board
+           with board.batch_update():
+               board.set_dimensions(board.string_count, main.fret_count)
+               board.set_highlighted_notes(main.highlighted_notes)
+               board.set_label_mode(main.label_mode)
+               board.set_pitch_reference(a4=main.a4)
+               positions = []
+               if pitches:
+                   positions = zip(*np.nonzero(np.isin(board.pitch_table().midi, pitches)))
+               board.set_highlighted_positions((int(s), int(f)) for s, f in positions)
+           if isinstance(board, PaintedFretboard) and isinstance(main, PaintedFretboard):
+               board.set_zoom(main.zoom)
+
+   def zoom_boards(self, factor):
+       """Zoom the painted boards by factor, or back to 100% for None"""
+       if not isinstance(self.fretboard, PaintedFretboard):
+           return
+       self.fretboard.set_zoom(1.0 if factor is None else self.fretboard.zoom * factor)
+
+   def create_midi_controls(self):
+       """Play a MIDI file or listen to a MIDI input and light up the sounding notes"""
+       midi_layout = QHBoxLayout()
+       midi_label = QLabel("MIDI:")
+       midi_label.setStyleSheet("color: #2c3e50; font-weight: bold;")
+       midi_layout.addWidget(midi_label)
+
+       play_button = QPushButton("Play File...")
+       play_button.clicked.connect(self.open_midi_file)
+       midi_layout.addWidget(play_button)
+       listen_button = QPushButton("Listen...")
+       listen_button.clicked.connect(self.listen_midi_input)
+       midi_layout.addWidget(listen_button)
+       detect_button = QPushButton("Detect WAV...")
+       detect_button.setToolTip("Highlight the notes detected in a recording")
+       detect_button.clicked.connect(self.open_wav_file)
+       midi_layout.addWidget(detect_button)
+       self.midi_stop_button = QPushButton("Stop")
+       self.midi_stop_button.setEnabled(False)
+       self.midi_stop_button.clicked.connect(self.stop_midi)
+       self.midi_stop_button.clicked.connect(self.stop_pitch_detection)
+       midi_layout.addWidget(self.midi_stop_button)
+       self.midi_positions_check = QCheckBox("Assign positions")
+       self.midi_positions_check.setStyleSheet("color: #2c3e50;")
+       self.midi_positions_check.setToolTip("Show each note at one string/fret instead of every place it occurs")
+       midi_layout.addWidget(self.midi_positions_check)
+       self.midi_status_label = QLabel()
+       self.midi_status_label.setStyleSheet("color: #2c3e50;")
+       midi_layout.addWidget(self.midi_status_label)
+       midi_layout.addStretch()
+
+       self.midi_scheduler = None
+       self.midi_input = None
+       self.midi_anchor_fret = 0
+       # One scheduler tick, so at most one board update, per display frame
+       self.midi_timer = QTimer(self)
+       self.midi_timer.setTimerType(Qt.PreciseTimer)
+       self.midi_timer.timeout.connect(self.midi_frame)
+
+       self.pitch_stream = None
+       self.pitch_detected.connect(self.show_detected_note)
+       self.pitch_finished.connect(self.handle_pitch_finished)
+       return midi_layout
+
+   def open_midi_file(self):
+       file_name, _ = QFileDialog.getOpenFileName(self, "Play MIDI File", QDir.homePath(),
+                                                  "MIDI Files (*.mid *.midi)")
+       if file_name:
+           self.play_midi_file(file_name)
+
+   def play_midi_file(self, file_name):
+       try:
+           events = load_midi_file(file_name)
+       except (OSError, ValueError) as e:
+           self.midi_status_label.setText(f"Could not play {os.path.basename(file_name)}: {e}")
+           return
+       self.start_midi(PlaybackScheduler(events, self.show_midi_notes))
+       self.midi_status_label.setText(f"Playing {os.path.basename(file_name)}")
+
+   def listen_midi_input(self):
+       virtual_port = "New virtual port \"Notez\""
+       port_name, ok = QInputDialog.getItem(self, "Listen to MIDI", "Input:",
+                                            input_port_names() + [virtual_port], 0, False)
+       if not ok:
+           return
+       scheduler = PlaybackScheduler(on_update=self.show_midi_notes, live=True)
+       try:
+           self.midi_input = MidiInputStream(scheduler, None if port_name == virtual_port else port_name)
+       except (RuntimeError, OSError) as e:
+           self.midi_status_label.setText(str(e))
+           return
+       self.start_midi(scheduler)
+       self.midi_status_label.setText(f"Listening to {port_name}")
+
+   def start_midi(self, scheduler):
+       self.stop_midi()
+       self.stop_pitch_detection()
+       self.midi_scheduler = scheduler
+       self.midi_anchor_fret = 0
+       screen = self.screen()
+       refresh_rate = screen.refreshRate() if screen is not None else 60
+       self.midi_timer.start(max(1, int(1000 / (refresh_rate or 60))))
+       self.midi_stop_button.setEnabled(True)
+       scheduler.start()
+
+   def midi_frame(self):
+       self.midi_scheduler.tick()
+       if self.midi_scheduler.finished:
+           self.stop_midi()
+           self.midi_status_label.setText("Finished")
+
+   def stop_midi(self):
+       if self.midi_scheduler is None:
+           return
+       self.midi_timer.stop()
+       if self.midi_input is not None:
+           self.midi_input.close()
+           self.midi_input = None
+       self.midi_scheduler = None
+       self.midi_stop_button.setEnabled(False)
+       self.midi_status_label.setText("")
+       self.record_history()
+
+   def show_midi_notes(self, notes):
+       """Highlight the sounding MIDI notes, by pitch or at one assigned position each"""
+       with self.fretboard.batch_update():
+           if self.midi_positions_check.isChecked():
+               positions = assign_positions(self.fretboard.pitch_table().midi, notes, self.midi_anchor_fret)
+               fretted = sorted(fret for _, fret in positions if fret)
+               if fretted:
+                   # Follow the hand up and down the neck
+                   self.midi_anchor_fret = fretted[len(fretted) // 2]
+               self.set_highlighted_notes([])
+               self.fretboard.set_highlighted_positions(positions)
+           else:
+               self.set_highlighted_notes({NOTES[note % 12] for note in notes})
+               self.fretboard.set_highlighted_positions([])
+
+   def open_wav_file(self):
+       file_name, _ = QFileDialog.getOpenFileName(self, "Detect Notes in WAV File", QDir.homePath(),
+                                                  "WAV Files (*.wav)")
+       if file_name:
+           self.start_pitch_detection(file_name)
+
+   def start_pitch_detection(self, source, sample_rate=None):
+       """Highlight the notes detected in a WAV file, or in raw 16-bit mono PCM on stdin for "-" """
+       # Only loaded when audio is first used
+       from pitch import DEFAULT_SAMPLE_RATE, PitchStream, read_pcm, read_wav
+
+       self.stop_midi()
+       self.stop_pitch_detection()
+       if source == "-":
+           sample_rate = sample_rate or DEFAULT_SAMPLE_RATE
+           chunks = read_pcm(sys.stdin.buffer)
+           name = "stdin"
+       else:
+           try:
+               sample_rate, chunks = read_wav(source)
+           except (OSError, ValueError) as e:
+               self.midi_status_label.setText(f"Could not open {os.path.basename(source)}: {e}")
+               return
+           name = os.path.basename(source)
+       # Files are paced to playback time so the notes show while they'd be heard
+       stream = PitchStream(chunks, sample_rate, self.pitch_detected.emit, self.pitch_finished.emit,
+                            realtime=source != "-", a4=self.fretboard.a4)
+       self.pitch_stream = stream
+       self.midi_stop_button.setEnabled(True)
+       self.midi_status_label.setText(f"Detecting notes in {name}")
+       stream.start()
+
+   @Slot(object, object)
+   def show_detected_note(self, stream, note):
+       if stream is not self.pitch_stream:
+           return  # Stopped or superseded
+       self.set_highlighted_notes([note] if note else [])
+
+   @Slot(object)
+   def handle_pitch_finished(self, stream):
+       if stream is self.pitch_stream:
+           self.stop_pitch_detection()
+           self.midi_status_label.setText("Finished")
+
+   def stop_pitch_detection(self):
+       if self.pitch_stream is None:
+           return
+       self.pitch_stream.cancel()
+       self.pitch_stream = None
+       self.midi_stop_button.setEnabled(False)
+       self.midi_status_label.setText("")
+       self.record_history()
+
+   def create_chord_group(self):
+       """Chord voicing finder: pick a chord, search the board, click a voicing to show it"""
+       chord_group = QGroupBox("Chord Voicings")
+       chord_layout = QVBoxLayout(chord_group)
+
+       chord_controls = QHBoxLayout()
+       self.chord_root_combo = QComboBox()
+       self.chord_root_combo.addItems(NOTES)
+       chord_controls.addWidget(self.chord_root_combo)
+       self.chord_quality_combo = QComboBox()
+       self.chord_quality_combo.addItems(list(CHORD_QUALITIES))
+       chord_controls.addWidget(self.chord_quality_combo)
+       span_label = QLabel("Max span:")
+       chord_controls.addWidget(span_label)
+       self.chord_span_spin = QSpinBox()
+       self.chord_span_spin.setRange(2, 7)
+       self.chord_span_spin.setValue(4)
+       chord_controls.addWidget(self.chord_span_spin)
+       chord_layout.addLayout(chord_controls)
+
+       search_controls = QHBoxLayout()
+       self.chord_search_button = QPushButton("Find Voicings")
+       self.chord_search_button.clicked.connect(self.start_voicing_search)
+       search_controls.addWidget(self.chord_search_button)
+       self.chord_cancel_button = QPushButton("Cancel")
+       self.chord_cancel_button.setEnabled(False)
+       self.chord_cancel_button.clicked.connect(self.cancel_voicing_search)
+       search_controls.addWidget(self.chord_cancel_button)
+       chord_layout.addLayout(search_controls)
+
+       self.chord_status_label = QLabel()
+       chord_layout.addWidget(self.chord_status_label)
+       self.voicing_list = QListWidget()
+       self.voicing_list.setMaximumHeight(140)
+       self.voicing_list.currentRowChanged.connect(self.show_voicing)
+       chord_layout.addWidget(self.voicing_list)
+
+       self.voicing_search = None
+       self.voicings = []
+       self.voicings_found.connect(self.handle_voicings_found)
+       return chord_group
+
+   def start_voicing_search(self):
+       """Search voicings of the selected chord on the current tuning in the background"""
+       self.cancel_voicing_search()
+       mask = chord_mask(self.chord_root_combo.currentText(), self.chord_quality_combo.currentText())
+       # Searched in this process: a process pool costs more to start than even 12-string searches take
+       search = VoicingSearch(self.fretboard.active_tuning(), self.fretboard.fret_count, mask,
+                              lambda voicings: self.voicings_found.emit(search, voicings),
+                              max_span=self.chord_span_spin.value())
+       self.voicing_search = search
+       self.chord_status_label.setText("Searching...")
+       self.chord_cancel_button.setEnabled(True)
+       search.start()
+
+   def cancel_voicing_search(self):
+       if self.voicing_search is not None:
+           self.voicing_search.cancel()
+           self.voicing_search = None
+           self.chord_cancel_button.setEnabled(False)
+           self.chord_status_label.setText("Cancelled")
+
+   @Slot(object, object)
+   def handle_voicings_found(self, search, voicings):
+       if search is not self.voicing_search:
+           return  # Superseded or cancelled
+       if voicings is None:
+           if search.error is None:
+               return  # Cancelled, cancel_voicing_search updated the controls
+           self.voicing_search = None
+           self.chord_cancel_button.setEnabled(False)
+           self.chord_status_label.setText(f"Search failed: {search.error}")
+           return
+       self.voicing_search = None
+       self.chord_cancel_button.setEnabled(False)
+       # Filling a list widget with tens of thousands of rows is slow, show the best ones
+       self.voicings = voicings[:500]
+       self.voicing_list.blockSignals(True)
+       self.voicing_list.clear()
+       self.voicing_list.addItems([f"{voicing_label(v)}   (span {v.span})" for v in self.voicings])
+       self.voicing_list.blockSignals(False)
+       shown = f", showing best {len(self.voicings)}" if len(voicings) > len(self.voicings) else ""
+       self.chord_status_label.setText(f"{len(voicings)} voicings{shown}")
+
+   def show_voicing(self, row):
+       """Highlight the cells of one voicing instead of whole pitch classes"""
+       if not 0 <= row < len(self.voicings):
+           return
+       with self.fretboard.batch_update():
+           self.set_highlighted_notes([])
+           self.fretboard.set_highlighted_positions(voicing_positions(self.voicings[row]))
+
+   def create_positions_group(self):
+       """Scale position finder: split the highlighted scale into playable positions, click one to show it"""
+       positions_group = QGroupBox("Scale Positions")
+       positions_layout = QVBoxLayout(positions_group)
+
+       position_controls = QHBoxLayout()
+       self.position_root_combo = QComboBox()
+       self.position_root_combo.addItems(NOTES)
+       self.position_root_combo.setToolTip("Root the CAGED shapes are built on")
+       position_controls.addWidget(self.position_root_combo)
+       self.position_pattern_combo = QComboBox()
+       for pattern in PATTERNS:
+           self.position_pattern_combo.addItem(POSITION_PATTERN_TITLES[pattern], pattern)
+       position_controls.addWidget(self.position_pattern_combo)
+       span_label = QLabel("Span:")
+       position_controls.addWidget(span_label)
+       self.position_span_spin = QSpinBox()
+       self.position_span_spin.setRange(2, 12)
+       self.position_span_spin.setValue(DEFAULT_SPAN)
+       self.position_span_spin.setToolTip("Frets per position (per string for 3 notes per string)")
+       position_controls.addWidget(self.position_span_spin)
+       positions_layout.addLayout(position_controls)
+
+       find_button = QPushButton("Find Positions")
+       find_button.clicked.connect(self.find_scale_positions)
+       positions_layout.addWidget(find_button)
+
+       self.position_status_label = QLabel()
+       positions_layout.addWidget(self.position_status_label)
+       self.position_list = QListWidget()
+       self.position_list.setMaximumHeight(140)
+       self.position_list.currentRowChanged.connect(self.show_scale_position)
+       positions_layout.addWidget(self.position_list)
+
+       # Notes of the last search; the list follows tuning, size and setting changes after that
+       self.position_notes = None
+       self.position_board = None
+       self.scale_positions = []
+       self.position_root_combo.currentIndexChanged.connect(self.refresh_scale_positions)
+       self.position_pattern_combo.currentIndexChanged.connect(self.refresh_scale_positions)
+       self.position_span_spin.valueChanged.connect(self.refresh_scale_positions)
+       return positions_group
+
+   def find_scale_positions(self):
+       """Split the highlighted notes into positions on the current board"""
+       root = NOTES.index(self.position_root_combo.currentText())
+       # Spelled from the root, like the presets
+       notes = [NOTES[(root + step) % 12] for step in range(12)
+                if NOTES[(root + step) % 12] in self.fretboard.highlighted_notes]
+       if not notes:
+           self.position_status_label.setText("Highlight a scale first")
+           return
+       self.position_notes = notes
+       self.update_scale_positions()
+
+   def refresh_scale_positions(self):
+       if self.position_notes is not None:
+           self.update_scale_positions()
+
+   def clear_scale_positions(self):
+       """Drop the positions of a scale that is no longer highlighted"""
+       if self.position_notes is None:
+           return
+       self.position_notes = None
+       self.position_board = None
+       self.scale_positions = []
+       self.position_list.clear()
+       self.position_status_label.clear()
+
+   def update_positions_for_board(self):
+       # Showing a position changes the board too, only a new tuning or size moves the positions
+       board = (tuple(self.fretboard.active_tuning()), self.fretboard.fret_count,
+                self.fretboard.lowest_octave, self.fretboard.octaves)
+       if self.position_notes is not None and board != self.position_board:
+           self.update_scale_positions()
+
+   def update_scale_positions(self):
+       tuning = self.fretboard.active_tuning()
+       span = self.position_span_spin.value()
+       self.position_board = (tuple(tuning), self.fretboard.fret_count,
+                              self.fretboard.lowest_octave, self.fretboard.octaves)
+       self.scale_positions = find_positions(tuning, self.fretboard.fret_count, self.position_notes, span,
+                                             self.position_pattern_combo.currentData(),
+                                             self.position_root_combo.currentText(),
+                                             self.fretboard.lowest_octave, self.fretboard.octaves)
+       self.position_list.blockSignals(True)
+       self.position_list.clear()
+       self.position_list.addItems([position_label(position) for position in self.scale_positions])
+       self.position_list.blockSignals(False)
+       notes = " ".join(self.position_notes)
+       if self.scale_positions:
+           self.position_status_label.setText(f"{len(self.scale_positions)} positions of {notes}")
+       else:
+           self.position_status_label.setText(f"No position of {notes} within {span} frets")
+
+   def show_scale_position(self, row):
+       """Highlight the cells of one position instead of the whole neck"""
+       if not 0 <= row < len(self.scale_positions):
+           return
+       with self.fretboard.batch_update():
+           self.set_highlighted_notes([])
+           self.fretboard.set_highlighted_positions(self.scale_positions[row].cells)
+
    def handle_preset_change(self, preset_name):
        """Handle selection of a preset from dropdown"""
-       if preset_name == "Select a scale...":
-           return
-          
-       scale_notes = {
-           "C Major": ["C", "D", "E", "F", "G", "A", "B"],
-           "A Minor": ["A", "B", "C", "D", "E", "F", "G"],
-           "G Major": ["G", "A", "B", "C", "D", "E", "F#"],
-           "E Minor": ["E", "F#", "G", "A", "B", "C", "D"],
-           "F Major": ["F", "G", "A", "A#", "C", "D", "E"],
-           "D Minor": ["D", "E", "F", "G", "A", "A#", "C"]
-       };
-      
-       if preset_name in scale_notes:
-           self.add_predefined_key(preset_name, scale_notes[preset_name])
+       scale = self.scale_engine.get(preset_name)
+       if scale is not None:
+           # Positions of the previous scale would otherwise be re-rooted by the combo change
+           searched, self.position_notes = self.position_notes, None
+           self.add_predefined_key(scale.name, scale.notes)
+           self.position_root_combo.setCurrentText(scale.root)
+           if searched is not None:
+               self.find_scale_positions()
           
        # Reset the dropdown after applying
-       QApplication.processEvents()  # Allow UI to update
-       self.preset_combo.setCurrentIndex(0)
+       self.preset_combo.setCurrentIndex(-1)
+       self.preset_combo.clearEditText()
+
+   def update_matching_scales(self):
+       """Show which scales contain all of the highlighted notes"""
+       notes = self.fretboard.highlighted_notes
+       if not notes:
+           self.matching_scales_label.clear()
+           self.matching_scales_label.setToolTip("")
+           return
+       matches = [scale.name for scale in self.scale_engine.scales_containing(notes)]
+       if not matches:
+           self.matching_scales_label.setText("No scale contains all highlighted notes")
+           self.matching_scales_label.setToolTip("")
+           return
+       shown = ", ".join(matches[:6]) + (f" (+{len(matches) - 6} more)" if len(matches) > 6 else "")
+       self.matching_scales_label.setText(f"In {len(matches)} scales: {shown}")
+       self.matching_scales_label.setToolTip("\n".join(matches[:40]))
   
    @Slot(int)
    def update_string_count(self, count):
-       # First, update the fretboard
-       self.fretboard.update_string_count(count)
-      
-       # No need to update tuning combos in the top area anymore since they'reremoved
+       self.fretboard.set_dimensions(count, self.fretboard.fret_count)
+
    @Slot(int)
    def update_fret_count(self, count):
-       self.fretboard.update_fret_count(count)
+       self.fretboard.set_dimensions(self.fretboard.string_count, count)
   
    @Slot(str)
    def update_tuning(self, string_idx, note):
@@ -502,72 +1627,257 @@ class MainWindow(QMainWindow):
    @Slot(bool)
    def toggle_note_highlight(self, note, checked):
        self.fretboard.update_highlighted_notes(note, checked)
+       self.clear_scale_positions()
+       self.update_matching_scales()
       
    def add_predefined_key(self, key_name, notes):
        """Helper method to add a predefined music key"""
-       # Clear current selection
-       for checkbox in self.note_checkboxes.values():
-           checkbox.setChecked(False)
-          
-       # Enable checkboxes for notes in the key
-       for note in notes:
-           if note in self.note_checkboxes:
-               self.note_checkboxes[note].setChecked(True)
+       self.set_highlighted_notes(notes)
+
+   def set_highlighted_notes(self, notes):
+       """Check exactly the given notes and highlight them with a single board update"""
+       notes = {note for note in notes if note in self.note_checkboxes}
+       # Block toggled so the checkboxes don't each trigger their own board update
+       for note, checkbox in self.note_checkboxes.items():
+           checkbox.blockSignals(True)
+           checkbox.setChecked(note in notes)
+           checkbox.blockSignals(False)
+       self.fretboard.set_highlighted_notes(notes)
+       self.update_matching_scales()
   
    def clear_highlighted_notes(self):
        """Clear all highlighted notes"""
-       for checkbox in self.note_checkboxes.values():
-           checkbox.setChecked(False)
+       with self.fretboard.batch_update():
+           self.set_highlighted_notes([])
+           self.fretboard.set_highlighted_positions([])
 
 
-   def handle_note_clicked(self, note):
+   def handle_note_clicked(self, string_idx, fret, note):
        # Check the corresponding checkbox if not already checked
        checkbox = self.note_checkboxes.get(note)
        if checkbox and not checkbox.isChecked():
            checkbox.setChecked(True)
 
 
-   def export_to_pdf(self):
-       """Export the fretboard visualization to PDF"""
-       file_name, _ = QFileDialog.getSaveFileName(
-           self,
-           "Export PDF",
-           QDir.homePath() + "/fretboard.pdf",
-           "PDF Files (*.pdf)"
-       )
+   def export_to_pdf(self, file_name=None):
+       """Queue an export of the fretboard as a vector PDF (a page per stacked instrument), SVG or PNG.
+
+       Returns the ExportJob, or None if no file was chosen.
+       """
+       # The export module pulls in QtSvg, only load it when it's first needed
+       from export import EXPORT_FORMATS, ExportQueue, with_export_extension
+
+       if file_name is None:
+           file_name, name_filter = QFileDialog.getSaveFileName(
+               self,
+               "Export PDF",
+               QDir.homePath() + "/fretboard.pdf",
+               ";;".join(EXPORT_FORMATS.values())
+           )
+           if file_name:
+               # A name typed without an extension gets the one of the chosen filter
+               file_name = with_export_extension(file_name, name_filter)
       
-       if file_name:
-           # Capture the entire window as a pixmap
-           pixmap = self.grab()
-          
-           # Create printer with custom settings
-           printer = QPrinter(QPrinter.HighResolution)
-           printer.setOutputFormat(QPrinter.PdfFormat)
-           printer.setOutputFileName(file_name)
-          
-           # Create painter
-           painter = QPainter()
-           if painter.begin(printer):
-               # Calculate scale to fit the page while making it larger
-               scale = min(printer.width() / pixmap.width(),
-                          printer.height() / pixmap.height()) * 1.5  # 1.5x zoom
-              
-               # Set the transform to scale up
-               painter.scale(scale, scale)
-              
-               # Draw the pixmap
-               painter.drawPixmap(0, 0, pixmap)
-               painter.end()
+       if not file_name:
+           return None
+       if self.export_queue is None:
+           self.export_queue = ExportQueue(self.export_progress.emit, self.export_finished.emit)
+       # Snapshots are immutable, the boards can keep changing while the export runs
+       boards = [self.fretboard] + [container.board for container in self.stacked_boards]
+       try:
+           job = self.export_queue.submit([board.snapshot() for board in boards], file_name)
+       except ValueError as e:
+           self.export_status_label.setText(f"Could not export {os.path.basename(file_name)}: {e}")
+           return None
+       self.export_cancel_button.show()
+       self.update_export_status()
+       return job
+
+   @Slot()
+   def cancel_exports(self):
+       if self.export_queue is not None:
+           self.export_queue.cancel_all()
+
+   def update_export_status(self, text=None):
+       current = self.export_queue.current
+       queued = len(self.export_queue.queued())
+       if text is None and current is not None:
+           text = f"Exporting {os.path.basename(current.file_name)}"
+       if queued:
+           text = f"{text or 'Exporting'} ({queued} queued)"
+       self.export_status_label.setText(text or "")
+
+   @Slot(object, int, int)
+   def handle_export_progress(self, job, done, total):
+       self.export_progress_bar.show()
+       if total > 1:
+           self.export_progress_bar.setRange(0, total)
+           self.export_progress_bar.setValue(done)
+       else:
+           self.export_progress_bar.setRange(0, 0)  # A single sheet has no steps, show it as busy
+       self.update_export_status()
+
+   @Slot(object)
+   def handle_export_finished(self, job):
+       name = os.path.basename(job.file_name)
+       if job.error:
+           print(f"warning: export of {name} failed: {job.error}", file=sys.stderr)
+           text = f"Export of {name} failed: {job.error}"
+       elif job.cancelled:
+           text = f"Export of {name} cancelled"
+       else:
+           text = f"Exported {name}"
+       if self.export_queue.current is None and not self.export_queue.queued():
+           self.export_progress_bar.hide()
+           self.export_cancel_button.hide()
+       self.update_export_status(text)
+
+   def paintEvent(self, event):
+       super().paintEvent(event)
+       if not self.fretboard._built:
+           # First frame is out, build the fretboard cells on the next event loop pass
+           QTimer.singleShot(0, self.build_fretboard)
+
+   def showEvent(self, event):
+       super().showEvent(event)
+       if not self.fretboard._built:
+           # In case the window is shown without being painted (e.g. minimized)
+           QTimer.singleShot(250, self.build_fretboard)
+
+   def build_fretboard(self):
+       if self.fretboard._built:
+           return
+       self.fretboard.ensure_built()
+       if self.startup_timer is not None:
+           self.startup_timer.mark("fretboard built")
+
+
+class StartupTimer(QObject):
+   """Startup timing report for --startup-timing: imports, window construction and first paints"""
+
+   def __init__(self):
+       super().__init__()
+       self.marks = {"imports": _IMPORTS_DONE}
+       self._frames = 0
+
+   def mark(self, name):
+       self.marks[name] = time.perf_counter()
+
+   def watch(self, window):
+       """Record when the window's first frame, and the first frame with the fretboard, are painted"""
+       window.installEventFilter(self)
+       self._window = window
+
+   def eventFilter(self, obj, event):
+       if event.type() == QEvent.UpdateRequest:
+           # The frame is painted while this event is delivered, so mark right after it
+           QTimer.singleShot(0, self._frame_painted)
+       return False
+
+   def _frame_painted(self):
+       self._frames += 1
+       if "first paint" not in self.marks:
+           self.mark("first paint")
+       elif "fretboard built" in self.marks and "fretboard painted" not in self.marks:
+           self.mark("fretboard painted")
+           self._window.removeEventFilter(self)
+           print(self.report(), file=sys.stderr)
+
+   def report(self):
+       since_launch = {name: (t - _STARTUP_T0) * 1000 for name, t in self.marks.items()}
+       window_ms = (self.marks["window constructed"] - self.marks["window start"]) * 1000
+       return (f"startup: imports {since_launch['imports']:.1f} ms, "
+               f"window construction {window_ms:.1f} ms, "
+               f"first paint at {since_launch['first paint']:.1f} ms, "
+               f"fretboard painted at {since_launch['fretboard painted']:.1f} ms (since launch)")
+
+
+# NOTEZ_PROFILE values that leave profiling off; on values profile without a trace file
+PROFILE_OFF = ("", "0", "false", "no", "off")
+PROFILE_ON = ("1", "true", "yes", "on")
+
+
+def profile_from_env():
+   """--profile default from NOTEZ_PROFILE: None when unset or off, "" when on, else the trace path"""
+   value = os.environ.get("NOTEZ_PROFILE", "").strip()
+   if value.lower() in PROFILE_OFF:
+       return None
+   return "" if value.lower() in PROFILE_ON else value
+
+
+def parse_args(argv):
+   import argparse
+
+   parser = argparse.ArgumentParser(description="Notez - String Instrument Visualizer")
+   parser.add_argument("--renderer", choices=sorted(FRETBOARD_RENDERERS), default="grid",
+                       help="fretboard backend: one widget per cell (grid) or a single painted widget")
+   parser.add_argument("--startup-timing", action="store_true",
+                       help="print import, window construction and first paint times to stderr")
+   parser.add_argument("--profile", nargs="?", const="", metavar="TRACE_JSON",
+                       default=profile_from_env(),
+                       help="time fretboard and window actions, show a p50/p99 overlay and "
+                            "write a Chrome trace to TRACE_JSON on exit (or set NOTEZ_PROFILE)")
+   parser.add_argument("--no-session", action="store_true",
+                       help="start with a default board and don't save the session on exit")
+   parser.add_argument("--pitch-input", metavar="SOURCE",
+                       help="highlight the notes detected in a WAV file, or in raw 16-bit mono "
+                            "little-endian PCM read from stdin when SOURCE is -")
+   parser.add_argument("--pcm-rate", type=int, default=None,
+                       help="sample rate of the stdin PCM for --pitch-input - (default: 44100)")
+   parser.add_argument("--stall-ms", type=float, default=None,
+                       help="with --profile, event loop stalls longer than this are recorded (default: 50)")
+   batch = parser.add_argument_group("batch export", "render reference sheets without opening a window")
+   batch.add_argument("--batch", metavar="JOB_FILE",
+                      help="JSON job file listing tunings, scales and fret counts to render")
+   batch.add_argument("--output-dir", default="sheets", help="directory for the rendered sheets")
+   batch.add_argument("--merge", metavar="PDF", help="also write every sheet into one multi-page PDF")
+   batch.add_argument("--workers", type=int, default=None,
+                      help="number of worker processes (default: one per CPU core)")
+   # Leave Qt's own options (-style, -platform, ...) to QApplication
+   return parser.parse_known_args(argv[1:])
+
+
+def run_batch_cli(args):
+   from batch_export import run_batch
+
+   try:
+       run_batch(args.batch, args.output_dir, merge=args.merge, workers=args.workers)
+   except (OSError, ValueError) as e:
+       print(f"error: {e}", file=sys.stderr)
+       return 1
+   return 0
 
 
 if __name__ == "__main__":
-   app = QApplication(sys.argv)
+   args, qt_args = parse_args(sys.argv)
+   if args.batch:
+       sys.exit(run_batch_cli(args))
+
+   app = QApplication(sys.argv[:1] + qt_args)
   
    # Set application style
    app.setStyle("Fusion")
   
-   window = MainWindow()
+   profiler = None
+   if args.profile is not None:
+       # Wrappers are only installed when profiling is on, a normal run keeps the plain methods
+       import perf
+       trace_file = None if args.profile.lower() in ("",) + PROFILE_ON else args.profile
+       profiler = perf.enable(FRETBOARD_RENDERERS.values(), MainWindow, trace_file, args.stall_ms)
+
+   startup_timer = None
+   if args.startup_timing:
+       startup_timer = StartupTimer()
+       startup_timer.mark("window start")
+   window = MainWindow(renderer=args.renderer, startup_timer=startup_timer,
+                       session_file=None if args.no_session else session_path())
+   if startup_timer is not None:
+       startup_timer.mark("window constructed")
+       startup_timer.watch(window)
+   if profiler is not None:
+       profiler.attach(window)
    window.show()
+   if args.pitch_input:
+       window.start_pitch_detection(args.pitch_input, args.pcm_rate)
   
    sys.exit(app.exec())
-
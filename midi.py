@@ -0,0 +1,282 @@
+import struct
+import time
+from collections import Counter, deque, namedtuple
+
+
+# velocity 0 is a note off; time is in seconds from the start of the file (None for live events)
+NoteEvent = namedtuple("NoteEvent", ["time", "note", "velocity", "channel"])
+
+DRUM_CHANNEL = 9  # General MIDI percussion, not pitched
+DEFAULT_TEMPO = 500000  # Microseconds per quarter note (120 bpm)
+MAX_HAND_SPAN = 4
+
+
+# --- Standard MIDI files ---
+
+def _read_varint(data, offset):
+   value = 0
+   while True:
+       byte = data[offset]
+       offset += 1
+       value = (value << 7) | (byte & 0x7F)
+       if not byte & 0x80:
+           return value, offset
+
+
+def _parse_track(data):
+   """(tick, kind, payload) for every note and tempo event of one MTrk chunk"""
+   events = []
+   tick = 0
+   offset = 0
+   status = None
+   while offset < len(data):
+       delta, offset = _read_varint(data, offset)
+       tick += delta
+       if data[offset] & 0x80:
+           status = data[offset]
+           offset += 1
+       elif status is None:
+           raise ValueError("Running status without a previous status byte")
+
+       if status == 0xFF:
+           meta_type = data[offset]
+           length, offset = _read_varint(data, offset + 1)
+           if meta_type == 0x51 and length == 3:
+               events.append((tick, "tempo", int.from_bytes(data[offset:offset + 3], "big")))
+           elif meta_type == 0x2F:
+               break  # End of track
+           offset += length
+           status = None  # Meta and sysex events cancel running status
+       elif status in (0xF0, 0xF7):
+           length, offset = _read_varint(data, offset)
+           offset += length
+           status = None
+       else:
+           kind = status & 0xF0
+           channel = status & 0x0F
+           if kind in (0xC0, 0xD0):
+               offset += 1
+               continue
+           note, velocity = data[offset], data[offset + 1]
+           offset += 2
+           if kind == 0x90:
+               events.append((tick, "note", (note, velocity, channel)))
+           elif kind == 0x80:
+               events.append((tick, "note", (note, 0, channel)))
+   return events
+
+
+def parse_midi(data, skip_drums=True):
+   """Note events of a Standard MIDI File (format 0 or 1), sorted by time in seconds"""
+   if data[:4] != b"MThd":
+       raise ValueError("Not a Standard MIDI File")
+   try:
+       header_length, _, track_count, division = struct.unpack(">IHHH", data[4:14])
+       offset = 8 + header_length
+       ticked = []
+       for _ in range(track_count):
+           chunk_type, length = struct.unpack(">4sI", data[offset:offset + 8])
+           offset += 8
+           if chunk_type == b"MTrk":
+               ticked.extend(_parse_track(data[offset:offset + length]))
+           offset += length
+   except (struct.error, IndexError) as e:
+       raise ValueError(f"Truncated MIDI file: {e}") from None
+   # Zero ticks per quarter note (or per SMPTE frame) gives events no time at all
+   if not division & (0xFF if division & 0x8000 else 0x7FFF):
+       raise ValueError("MIDI file has no time division")
+
+   # Tempo changes apply to every track, so walk all events in tick order
+   ticked.sort(key=lambda event: (event[0], event[1] != "tempo"))
+   if division & 0x8000:
+       # SMPTE timing: frames per second and ticks per frame, tempo doesn't matter
+       frames_per_second = 256 - (division >> 8)
+       seconds_per_tick = 1 / (frames_per_second * (division & 0xFF))
+       tempo_scale = None
+   else:
+       tempo_scale = 1e-6 / division
+       seconds_per_tick = DEFAULT_TEMPO * tempo_scale
+
+   events = []
+   last_tick = 0
+   seconds = 0.0
+   for tick, kind, payload in ticked:
+       seconds += (tick - last_tick) * seconds_per_tick
+       last_tick = tick
+       if kind == "tempo":
+           if tempo_scale is not None:
+               seconds_per_tick = payload * tempo_scale
+       elif not (skip_drums and payload[2] == DRUM_CHANNEL):
+           events.append(NoteEvent(seconds, *payload))
+   return events
+
+
+def load_midi_file(file_name, skip_drums=True):
+   with open(file_name, "rb") as f:
+       return parse_midi(f.read(), skip_drums)
+
+
+# --- Playback ---
+
+class ManualClock:
+   """Clock for offline replay and tests: time only moves when advance() is called"""
+
+   def __init__(self, start=0.0):
+       self.now = start
+
+   def __call__(self):
+       return self.now
+
+   def advance(self, seconds):
+       self.now += seconds
+
+
+class PlaybackScheduler:
+   """Applies timed and live note events once per tick and reports the sounding notes if they changed.
+
+   Event times are measured from start() on the clock, never accumulated, so playback
+   can't drift however late individual ticks are. Call tick() once per display frame.
+   """
+
+   def __init__(self, events=(), on_update=None, clock=time.perf_counter, live=False):
+       self.events = sorted(events, key=lambda event: event.time)
+       self.on_update = on_update
+       self.clock = clock
+       self.live = live
+       self._live_events = deque()  # Appended from the MIDI input thread
+       self._sounding = Counter()  # (channel, note) -> overlapping note-ons
+       self._index = 0
+       self._start = None
+       self._shown = frozenset()
+       self._flashing = False
+
+   def start(self):
+       self._start = self.clock()
+       self._index = 0
+       self._sounding.clear()
+       self._shown = frozenset()
+
+   def push(self, note, velocity, channel=0):
+       """Queue a live event for the next tick; safe to call from any thread"""
+       self._live_events.append(NoteEvent(None, note, velocity, channel))
+
+   @property
+   def finished(self):
+       # Notes flashed by the last tick still need the tick that clears them
+       return not self.live and self._index >= len(self.events) and not self._flashing
+
+   def position(self):
+       """Seconds played since start()"""
+       return self.clock() - self._start
+
+   def tick(self):
+       """Apply every event that is due; returns True if on_update was called"""
+       now = self.position()
+       struck = set()
+       while self._index < len(self.events) and self.events[self._index].time <= now:
+           self._apply(self.events[self._index], struck)
+           self._index += 1
+       while self._live_events:
+           self._apply(self._live_events.popleft(), struck)
+
+       # Notes struck and released within one frame are still shown for that frame
+       sounding = frozenset(note for _, note in self._sounding)
+       shown = sounding | struck
+       self._flashing = not struck <= sounding
+       if shown == self._shown:
+           return False
+       self._shown = shown
+       if self.on_update:
+           self.on_update(shown)
+       return True
+
+   def _apply(self, event, struck):
+       key = (event.channel, event.note)
+       if event.velocity:
+           self._sounding[key] += 1
+           struck.add(event.note)
+       elif key in self._sounding:
+           self._sounding[key] -= 1
+           if not self._sounding[key]:
+               del self._sounding[key]
+
+
+def replay(events, frame_seconds=1 / 60, on_update=None):
+   """Play events offline against a ManualClock; returns the number of board updates"""
+   clock = ManualClock()
+   scheduler = PlaybackScheduler(events, on_update, clock)
+   scheduler.start()
+   updates = 0
+   while not scheduler.finished:
+       clock.advance(frame_seconds)
+       updates += scheduler.tick()
+   return updates
+
+
+# --- Live input (optional mido + python-rtmidi) ---
+
+def input_port_names():
+   """Names of the MIDI inputs, empty if mido isn't installed"""
+   try:
+       import mido
+   except ImportError:
+       return []
+   return mido.get_input_names()
+
+
+class MidiInputStream:
+   """Feeds note messages from a MIDI input, or a new virtual one, into a scheduler"""
+
+   def __init__(self, scheduler, port_name=None, virtual_name="Notez"):
+       try:
+           import mido
+       except ImportError:
+           raise RuntimeError("Live MIDI input needs the mido and python-rtmidi packages") from None
+       self.scheduler = scheduler
+       if port_name is None:
+           self.port = mido.open_input(virtual_name, virtual=True, callback=self._on_message)
+       else:
+           self.port = mido.open_input(port_name, callback=self._on_message)
+
+   def _on_message(self, message):
+       # Runs on the MIDI backend's thread
+       if message.type == "note_on":
+           self.scheduler.push(message.note, message.velocity, message.channel)
+       elif message.type == "note_off":
+           self.scheduler.push(message.note, 0, message.channel)
+
+   def close(self):
+       self.port.close()
+
+
+# --- Fretboard positions ---
+
+def assign_positions(midi_matrix, notes, anchor_fret=0, max_span=MAX_HAND_SPAN):
+   """One (string, fret) per MIDI note, at most one note per string, kept near anchor_fret.
+
+   midi_matrix holds the MIDI note of every cell (PitchTable.midi). Notes go to a cell
+   with the same pitch; only a note the board can't play in its octave falls back to a
+   cell with the same pitch class.
+   """
+   string_count, fret_total = midi_matrix.shape
+   free_strings = set(range(string_count))
+   positions = []
+   # Highest notes first so they land on the higher strings (string 0 is the highest)
+   for note in sorted(notes, reverse=True):
+       best = None
+       for same_octave in (True, False):
+           for string_idx in sorted(free_strings):
+               for fret in range(fret_total):
+                   cell = int(midi_matrix[string_idx, fret])
+                   if cell != note if same_octave else (cell - note) % 12:
+                       continue
+                   # Frets outside the hand span around the anchor are a last resort
+                   cost = (abs(fret - anchor_fret) > max_span, abs(fret - anchor_fret), string_idx)
+                   if best is None or cost < best[0]:
+                       best = (cost, string_idx, fret)
+           if best is not None:
+               break
+       if best is not None:
+           free_strings.discard(best[1])
+           positions.append((best[1], best[2]))
+   return positions
@@ -0,0 +1,256 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from PySide6.QtCore import Qt, QEvent, QObject, QTimer
+from PySide6.QtWidgets import QLabel, QWidget
+
+
+# Only imported when profiling is switched on (--profile or NOTEZ_PROFILE), so a normal
+# run has no wrappers, timers or counters at all.
+
+DEFAULT_STALL_MS = 50
+HEARTBEAT_MS = 20
+OVERLAY_REFRESH_MS = 500
+ROLLING_WINDOW = 200
+MAX_TRACE_EVENTS = 200000
+
+# Methods wrapped with timing, per class
+BOARD_METHODS = [
+   "initialize_grid", "set_dimensions", "update_tuning", "set_tuning", "update_highlighted_notes",
+   "set_highlighted_notes", "set_highlighted_positions", "add_string", "remove_string",
+   "add_fret", "remove_fret", "set_label_mode", "set_pitch_reference", "set_zoom", "_apply_dimensions",
+   "_apply_tuning", "_apply_labels", "_apply_highlights",
+]
+WINDOW_METHODS = [
+   "handle_preset_change", "handle_tuning_change", "update_string_count", "update_fret_count",
+   "update_tuning", "toggle_note_highlight", "add_predefined_key", "set_highlighted_notes",
+   "clear_highlighted_notes", "handle_note_clicked", "update_matching_scales", "export_to_pdf",
+   "start_voicing_search", "handle_voicings_found", "show_voicing", "build_fretboard",
+   "midi_frame", "show_midi_notes", "show_detected_note", "undo", "redo",
+   "add_stacked_instrument", "sync_stacked_boards", "zoom_boards",
+   "handle_export_progress", "handle_export_finished", "find_scale_positions", "update_scale_positions",
+   "show_scale_position",
+]
+# Calls that rebuild fretboard cells rather than restyle them. _apply_dimensions is left out:
+# it runs inside every rebuild and on its own only for incremental resizes
+REBUILD_METHODS = ("initialize_grid",)
+
+
+def percentile(values, fraction):
+   ordered = sorted(values)
+   return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Profiler:
+   """Times wrapped methods, counts restyles and records event loop stalls as a Chrome trace"""
+
+   def __init__(self, trace_file=None, stall_ms=DEFAULT_STALL_MS):
+       self.trace_file = trace_file
+       self.stall_ms = stall_ms
+       self.counters = Counter()
+       # label -> recent durations in ms, and the fan-out of each top-level action
+       self.durations = defaultdict(lambda: deque(maxlen=ROLLING_WINDOW))
+       self.fan_out = defaultdict(lambda: deque(maxlen=ROLLING_WINDOW))
+       self.actions = set()
+       self.events = []
+       self._t0 = time.perf_counter()
+       self._depth = 0
+       self._calls_in_action = 0
+       self._patches = []
+       self._heartbeat = None
+       self._last_beat = None
+
+   def _ts(self, t):
+       # Chrome trace timestamps are microseconds
+       return (t - self._t0) * 1e6
+
+   def _record(self, event):
+       if len(self.events) < MAX_TRACE_EVENTS:
+           event.setdefault("pid", os.getpid())
+           event.setdefault("tid", threading.get_ident())
+           self.events.append(event)
+       else:
+           self.counters["dropped trace events"] += 1
+
+   # --- Wrapping ---
+
+   def _patch(self, cls, name, replacement):
+       self._patches.append((cls, name, cls.__dict__.get(name)))
+       setattr(cls, name, replacement)
+
+   def instrument(self, cls, names):
+       """Wrap cls.<name> for every name with timing; inherited methods are wrapped on cls"""
+       for name in names:
+           original = getattr(cls, name, None)
+           if original is None or hasattr(original, "_perf_original"):
+               continue
+           self._patch(cls, name, self._timed(f"{cls.__name__}.{name}", name, original))
+
+   def _timed(self, label, name, func):
+       profiler = self
+       rebuild = name in REBUILD_METHODS
+
+       @functools.wraps(func)
+       def timed(*args, **kwargs):
+           if threading.current_thread() is not threading.main_thread():
+               return func(*args, **kwargs)
+           top_level = profiler._depth == 0
+           if top_level:
+               profiler._calls_in_action = 0
+           else:
+               profiler._calls_in_action += 1
+           profiler.counters[label] += 1
+           if rebuild:
+               profiler.counters["grid rebuilds"] += 1
+           profiler._depth += 1
+           start = time.perf_counter()
+           try:
+               return func(*args, **kwargs)
+           finally:
+               end = time.perf_counter()
+               profiler._depth -= 1
+               profiler.durations[label].append((end - start) * 1000)
+               event = {"name": label, "cat": "action" if top_level else "call", "ph": "X",
+                        "ts": profiler._ts(start), "dur": (end - start) * 1e6}
+               if top_level:
+                   # Everything wrapped that ran because of this action
+                   profiler.actions.add(label)
+                   profiler.fan_out[label].append(profiler._calls_in_action)
+                   event["args"] = {"fan_out": profiler._calls_in_action}
+               profiler._record(event)
+
+       timed._perf_original = func
+       return timed
+
+   def count_style_changes(self):
+       """Count setStyleSheet calls and noteState re-polishes of grid cells"""
+       profiler = self
+       set_style_sheet = QWidget.setStyleSheet
+       set_property = QObject.setProperty
+
+       def counting_set_style_sheet(widget, style_sheet):
+           profiler.counters["setStyleSheet"] += 1
+           return set_style_sheet(widget, style_sheet)
+
+       def counting_set_property(obj, name, value):
+           if name == "noteState":
+               profiler.counters["cell restyles"] += 1
+           return set_property(obj, name, value)
+
+       self._patch(QWidget, "setStyleSheet", counting_set_style_sheet)
+       self._patch(QObject, "setProperty", counting_set_property)
+
+   def uninstall(self):
+       """Put every wrapped method back"""
+       for cls, name, original in reversed(self._patches):
+           if original is None:
+               delattr(cls, name)
+           else:
+               setattr(cls, name, original)
+       self._patches = []
+
+   # --- Event loop stalls ---
+
+   def start_stall_detection(self):
+       # A heartbeat that arrives late means the event loop was busy for the difference
+       self._heartbeat = QTimer()
+       self._heartbeat.setTimerType(Qt.PreciseTimer)
+       self._heartbeat.timeout.connect(self._beat)
+       self._last_beat = time.perf_counter()
+       self._heartbeat.start(HEARTBEAT_MS)
+
+   def _beat(self):
+       now = time.perf_counter()
+       late_ms = (now - self._last_beat) * 1000 - HEARTBEAT_MS
+       if late_ms > self.stall_ms:
+           self.counters["stalls"] += 1
+           self.durations["event loop stall"].append(late_ms)
+           self._record({"name": "event loop stall", "cat": "stall", "ph": "X",
+                         "ts": self._ts(self._last_beat) + HEARTBEAT_MS * 1000, "dur": late_ms * 1000})
+       self._last_beat = now
+
+   # --- Reporting ---
+
+   def summary_lines(self):
+       lines = [f"{'action':32} {'n':>5} {'p50 ms':>8} {'p99 ms':>8} {'fan-out':>7}"]
+       for label in sorted(self.actions, key=lambda label: -percentile(self.durations[label], 0.99)):
+           durations = self.durations[label]
+           lines.append(f"{label:32} {self.counters[label]:5} {percentile(durations, 0.5):8.2f} "
+                        f"{percentile(durations, 0.99):8.2f} {max(self.fan_out[label]):7}")
+       lines.append(f"grid rebuilds {self.counters['grid rebuilds']}, "
+                    f"cell restyles {self.counters['cell restyles']}, "
+                    f"setStyleSheet {self.counters['setStyleSheet']}, "
+                    f"stalls > {self.stall_ms} ms {self.counters['stalls']}")
+       return lines
+
+   def record_counters(self):
+       self._record({"name": "counters", "ph": "C", "ts": self._ts(time.perf_counter()),
+                     "args": {name: self.counters[name] for name in
+                              ("grid rebuilds", "cell restyles", "setStyleSheet", "stalls")}})
+
+   def dump(self, trace_file=None):
+       """Write the recorded spans, stalls and counters as a Chrome trace (chrome://tracing, Perfetto)"""
+       trace_file = trace_file or self.trace_file
+       if not trace_file:
+           return
+       self.record_counters()
+       with open(trace_file, "w", encoding="utf-8") as f:
+           json.dump({"traceEvents": self.events, "displayTimeUnit": "ms",
+                      "otherData": {"counters": dict(self.counters)}}, f)
+       print(f"wrote {trace_file}", file=sys.stderr)
+
+   def attach(self, window):
+       """Show the overlay on window, start stall detection and dump the trace on quit"""
+       self.overlay = PerfOverlay(self, window)
+       self.start_stall_detection()
+       from PySide6.QtWidgets import QApplication
+       QApplication.instance().aboutToQuit.connect(self.dump)
+
+
+class PerfOverlay(QLabel):
+   """Rolling p50/p99 per action in the corner of the window"""
+
+   def __init__(self, profiler, window):
+       super().__init__(window)
+       self.profiler = profiler
+       self.setAttribute(Qt.WA_TransparentForMouseEvents)
+       self.setStyleSheet("background-color: rgba(35, 41, 70, 200); color: #fffffe;"
+                          "font-family: monospace; font-size: 9pt; padding: 6px; border-radius: 4px;")
+       self.setTextFormat(Qt.PlainText)
+       window.installEventFilter(self)
+       self._timer = QTimer(self)
+       self._timer.timeout.connect(self.refresh)
+       self._timer.start(OVERLAY_REFRESH_MS)
+       self.refresh()
+       self.show()
+
+   def refresh(self):
+       self.setText("\n".join(self.profiler.summary_lines()))
+       self.profiler.record_counters()
+       self.adjustSize()
+       self._place()
+
+   def _place(self):
+       window = self.parentWidget()
+       self.move(window.width() - self.width() - 10, 10)
+       self.raise_()
+
+   def eventFilter(self, obj, event):
+       if event.type() == QEvent.Resize:
+           self._place()
+       return False
+
+
+def enable(board_classes, window_class, trace_file=None, stall_ms=None):
+   """Instrument the fretboard and window classes; call before the window is created"""
+   profiler = Profiler(trace_file, stall_ms or DEFAULT_STALL_MS)
+   for cls in board_classes:
+       profiler.instrument(cls, BOARD_METHODS)
+   profiler.instrument(window_class, WINDOW_METHODS)
+   profiler.count_style_changes()
+   return profiler
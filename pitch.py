@@ -0,0 +1,222 @@
+import threading
+import time
+import wave
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from fretboard_model import NOTES, NoteCalculator
+
+
+CHUNK_FRAMES = 4096
+DEFAULT_SAMPLE_RATE = 44100
+
+
+# --- Sources ---
+
+def pcm_to_float(data, sample_width, channels):
+   """Little-endian integer PCM bytes to mono float32 in [-1, 1)"""
+   if sample_width == 1:
+       samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) / 128
+   elif sample_width == 2:
+       samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768
+   elif sample_width == 3:
+       raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+       values = raw[:, 0] | raw[:, 1] << 8 | raw[:, 2] << 16
+       samples = (values - ((values & 0x800000) << 1)).astype(np.float32) / 8388608
+   elif sample_width == 4:
+       samples = np.frombuffer(data, dtype="<i4").astype(np.float32) / 2147483648
+   else:
+       raise ValueError(f"Unsupported sample width: {sample_width} bytes")
+   if channels > 1:
+       samples = samples.reshape(-1, channels).mean(axis=1)
+   return samples
+
+
+def read_wav(file_name, chunk_frames=CHUNK_FRAMES):
+   """(sample rate, iterator of mono float32 chunks) of a PCM WAV file"""
+   try:
+       wav = wave.open(file_name, "rb")
+   except (wave.Error, EOFError) as e:
+       raise ValueError(f"Not a PCM WAV file: {e}") from None
+   sample_rate, sample_width, channels = wav.getframerate(), wav.getsampwidth(), wav.getnchannels()
+
+   def chunks():
+       with wav:
+           while True:
+               data = wav.readframes(chunk_frames)
+               if not data:
+                   return
+               yield pcm_to_float(data, sample_width, channels)
+
+   return sample_rate, chunks()
+
+
+def read_pcm(stream, sample_width=2, channels=1, chunk_frames=CHUNK_FRAMES):
+   """Mono float32 chunks of raw little-endian PCM from a binary stream such as stdin"""
+   frame_bytes = sample_width * channels
+   leftover = b""
+   while True:
+       data = stream.read(chunk_frames * frame_bytes)
+       if not data:
+           return
+       data = leftover + data
+       usable = len(data) - len(data) % frame_bytes
+       leftover = data[usable:]
+       if usable:
+           yield pcm_to_float(data[:usable], sample_width, channels)
+
+
+# --- Detection ---
+
+class PitchDetector:
+   """Streaming monophonic pitch detector: normalized autocorrelation (McLeod) over overlapping frames.
+
+   process() takes chunks of any size and analyses every complete frame at once with
+   batched FFTs, carrying the tail over to the next chunk.
+   """
+
+   def __init__(self, sample_rate, frame_size=2048, hop_size=1024, min_frequency=60.0,
+                max_frequency=1500.0, clarity=0.7, silence_rms=0.01):
+       self.sample_rate = sample_rate
+       self.frame_size = frame_size
+       self.hop_size = hop_size
+       self.min_lag = max(2, int(sample_rate / max_frequency))
+       self.max_lag = min(frame_size - 2, int(np.ceil(sample_rate / min_frequency)))
+       self.clarity = clarity
+       self.silence_rms = silence_rms
+       # Zero padding to twice the frame turns the circular FFT correlation into a linear one
+       self._fft_size = 1 << (2 * frame_size - 1).bit_length()
+       self._buffer = np.zeros(0, dtype=np.float32)
+       self.frames_done = 0
+
+   def process(self, samples):
+       """Frequency in Hz of every frame completed by samples, NaN where no clear pitch"""
+       buffer = np.concatenate((self._buffer, np.asarray(samples, dtype=np.float32)))
+       if len(buffer) < self.frame_size:
+           self._buffer = buffer
+           return np.zeros(0)
+       count = (len(buffer) - self.frame_size) // self.hop_size + 1
+       frames = sliding_window_view(buffer, self.frame_size)[::self.hop_size][:count]
+       frequencies = self.detect(frames)
+       self._buffer = buffer[count * self.hop_size:]
+       self.frames_done += count
+       return frequencies
+
+   def frame_times(self, count):
+       """Start time in seconds of the last count frames returned by process()"""
+       first = self.frames_done - count
+       return (np.arange(first, self.frames_done) * self.hop_size) / self.sample_rate
+
+   def detect(self, frames):
+       frames = frames - frames.mean(axis=1, keepdims=True)
+       squares = frames * frames
+       rms = np.sqrt(squares.mean(axis=1))
+
+       spectrum = np.fft.rfft(frames, self._fft_size, axis=1)
+       lags = self.max_lag + 2
+       acf = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, self._fft_size, axis=1)[:, :lags]
+
+       # m(lag) = sum of x[j]^2 + x[j + lag]^2 over the overlap, from running sums
+       cumulative = np.cumsum(squares, axis=1)
+       total = cumulative[:, -1:]
+       lag = np.arange(lags)
+       head = cumulative[:, self.frame_size - 1 - lag]
+       tail = total - np.concatenate((np.zeros((len(frames), 1)), cumulative[:, :lags - 1]), axis=1)
+       energy = head + tail
+       nsdf = np.divide(2 * acf, energy, out=np.zeros_like(acf), where=energy > 0)
+
+       # Key maxima: local maxima in the lag range; take the first within 90% of the best,
+       # which avoids picking a multiple of the period (an octave too low)
+       middle = nsdf[:, 1:-1]
+       peaks = (middle > nsdf[:, :-2]) & (middle >= nsdf[:, 2:])
+       peaks[:, :self.min_lag - 1] = False
+       peak_values = np.where(peaks, middle, -np.inf)
+       best = peak_values.max(axis=1, keepdims=True)
+       chosen = np.argmax(peaks & (middle >= 0.9 * best), axis=1)
+       rows = np.arange(len(frames))
+       lag_idx = chosen + 1
+       clarity = nsdf[rows, lag_idx]
+
+       # Parabolic interpolation around the peak for sub-sample lag
+       before, after = nsdf[rows, lag_idx - 1], nsdf[rows, lag_idx + 1]
+       curvature = before - 2 * clarity + after
+       shift = np.divide(0.5 * (before - after), curvature, out=np.zeros_like(curvature), where=curvature != 0)
+       period = lag_idx + np.clip(shift, -0.5, 0.5)
+
+       valid = np.isfinite(best[:, 0]) & (clarity >= self.clarity) & (rms >= self.silence_rms)
+       return np.where(valid, self.sample_rate / period, np.nan)
+
+
+class NoteTracker:
+   """Turns per-frame pitch classes into note changes once a note has held for a few frames"""
+
+   def __init__(self, stable_frames=3):
+       self.stable_frames = stable_frames
+       self.current = -1
+       self._candidate = -1
+       self._count = 0
+
+   def update(self, pitch_classes):
+       """Feed pitch classes (-1 = none); returns the new stable pitch class, or None if unchanged"""
+       changed = None
+       for pitch_class in pitch_classes.tolist():
+           if pitch_class == self._candidate:
+               self._count += 1
+           else:
+               self._candidate, self._count = pitch_class, 1
+           if self._count == self.stable_frames and pitch_class != self.current:
+               self.current = changed = pitch_class
+       return changed
+
+
+# --- Streaming ---
+
+class PitchStream:
+   """Runs detection over a chunk source on a background thread, reporting note changes.
+
+   on_note(stream, note) gets a note name or None for silence, on_done(stream) is called
+   at the end. With realtime, a file source is paced to its playback time.
+   """
+
+   def __init__(self, chunks, sample_rate, on_note, on_done=None, realtime=False, a4=440.0):
+       self.chunks = chunks
+       self.detector = PitchDetector(sample_rate)
+       self.tracker = NoteTracker()
+       self.note_calculator = NoteCalculator()
+       self.on_note = on_note
+       self.on_done = on_done
+       self.realtime = realtime
+       self.a4 = a4
+       self.cancel_event = threading.Event()
+       self._thread = threading.Thread(target=self._run, daemon=True)
+
+   def start(self):
+       self._thread.start()
+
+   def cancel(self):
+       self.cancel_event.set()
+
+   def _run(self):
+       start = time.perf_counter()
+       samples_read = 0
+       try:
+           for chunk in self.chunks:
+               if self.cancel_event.is_set():
+                   return
+               samples_read += len(chunk)
+               self.feed(chunk)
+               if self.realtime:
+                   # Don't run ahead of playback time
+                   delay = samples_read / self.detector.sample_rate - (time.perf_counter() - start)
+                   if delay > 0 and self.cancel_event.wait(delay):
+                       return
+       finally:
+           if self.on_done and not self.cancel_event.is_set():
+               self.on_done(self)
+
+   def feed(self, chunk):
+       pitch_classes = self.note_calculator.get_pitch_classes(self.detector.process(chunk), self.a4)
+       changed = self.tracker.update(pitch_classes)
+       if changed is not None:
+           self.on_note(self, NOTES[changed] if changed >= 0 else None)
@@ -0,0 +1,172 @@
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from fretboard_model import DEFAULT_LOWEST_OCTAVE, NOTE_INDEX, highlight_mask, notes_to_mask, open_midi_notes, pitch_matrix
+
+
+# How a scale is split into positions: every complete k-fret window, the five CAGED boxes,
+# or three notes per string
+PATTERNS = ("box", "caged", "3nps")
+DEFAULT_SPAN = 5
+
+# CAGED boxes as (shape, root string counted from the lowest, first fret of the box relative
+# to that root's fret), e.g. the E shape has its root on the lowest string under the index
+# finger. The shapes are the guitar's; on other tunings they only anchor the windows.
+CAGED_SHAPES = (
+   ("C", 1, -3),
+   ("A", 1, -1),
+   ("G", 0, -3),
+   ("E", 0, -1),
+   ("D", 2, 0),
+)
+
+# cells are the (string, fret) pairs of the position; shape is the CAGED letter or None
+ScalePosition = namedtuple("ScalePosition", ["pattern", "low", "high", "cells", "shape"])
+
+
+def position_label(position):
+   """List label of a position: 'E shape, frets 7-10'"""
+   frets = f"frets {position.low}-{position.high}"
+   if position.shape:
+       return f"{position.shape} shape, {frets}"
+   if position.pattern == "3nps":
+       return f"3 per string, {frets}"
+   return frets[0].upper() + frets[1:]
+
+
+class PositionIndex:
+   """Pitch classes within every fret window of one tuning and fret count.
+
+   Per-fret pitch-class counts are summed along the neck once, so the pitch-class set of any
+   window is a difference of two rows, and all windows of a span are found in one pass
+   sliding over the prefix sums. Build a new index when the tuning or fret count changes.
+   lowest_octave and octaves place the open strings like open_midi_notes does.
+   """
+
+   def __init__(self, tuning, fret_count, lowest_octave=DEFAULT_LOWEST_OCTAVE, octaves=()):
+       self.tuning = tuple(tuning)
+       self.fret_count = fret_count
+       self.open_notes = open_midi_notes(self.tuning, lowest_octave, octaves)
+       self.matrix = pitch_matrix(self.tuning, fret_count)
+       per_fret = np.zeros((fret_count + 1, 12), dtype=np.int32)
+       frets = np.broadcast_to(np.arange(fret_count + 1), self.matrix.shape)
+       np.add.at(per_fret, (frets, self.matrix), 1)
+       # _prefix[f] counts every pitch class on frets below f
+       self._prefix = np.vstack((np.zeros((1, 12), dtype=np.int32), np.cumsum(per_fret, axis=0)))
+       self._window_masks = {}
+
+   def window_masks(self, span):
+       """12-bit pitch-class mask of every window of span frets, indexed by its lowest fret"""
+       masks = self._window_masks.get(span)
+       if masks is None:
+           if span > self.fret_count + 1:
+               masks = np.zeros(0, dtype=np.int64)
+           else:
+               counts = self._prefix[span:] - self._prefix[:-span]
+               masks = (counts > 0).astype(np.int64) @ (1 << np.arange(12))
+           masks.setflags(write=False)
+           self._window_masks[span] = masks
+       return masks
+
+   def complete_windows(self, mask, span):
+       """Lowest fret of every span-fret window that holds all pitch classes of mask"""
+       return np.flatnonzero(self.window_masks(span) & mask == mask).tolist()
+
+   def cells(self, mask, low, high):
+       """(string, fret) of the cells between frets low and high that play a note of mask"""
+       strings, frets = np.nonzero(highlight_mask(self.matrix[:, low:high + 1], mask))
+       return tuple(zip(strings.tolist(), (frets + low).tolist()))
+
+   def boxes(self, mask, span):
+       return [ScalePosition("box", low, low + span - 1, self.cells(mask, low, low + span - 1), None)
+               for low in self.complete_windows(mask, span)]
+
+   def caged(self, mask, root, span):
+       """The complete windows anchored on a root the way the CAGED boxes are, in fret order"""
+       complete = set(self.complete_windows(mask, span))
+       string_count = len(self.tuning)
+       positions = []
+       for shape, root_string, offset in CAGED_SHAPES:
+           if root_string >= string_count:
+               continue
+           # Strings are stored highest first, the shapes count from the lowest
+           string_idx = string_count - 1 - root_string
+           for fret in np.flatnonzero(self.matrix[string_idx] == root).tolist():
+               low = fret + offset
+               if low in complete:
+                   positions.append(ScalePosition("caged", low, low + span - 1,
+                                                  self.cells(mask, low, low + span - 1), shape))
+       positions.sort(key=lambda position: (position.low, position.shape))
+       return positions
+
+   def notes_per_string(self, mask, span, count=3):
+       """Patterns that climb the scale count notes per string from every scale note of the lowest string.
+
+       The strings are climbed in pitch order, so re-entrant strings and octave courses take
+       their turn where their pitch falls. A pattern is kept if it fits on the neck and each
+       string's notes lie within span frets.
+       """
+       # Lowest pitch first; of equal strings the one further from the top comes first
+       strings = sorted(range(len(self.tuning)),
+                        key=lambda string_idx: (self.open_notes[string_idx], -string_idx))
+       open_notes = [self.open_notes[string_idx] for string_idx in strings]
+       top = max(open_notes) + self.fret_count
+       tones = [note for note in range(open_notes[0], top + 1) if mask >> note % 12 & 1]
+       positions = []
+       for start in range(len(tones)):
+           if tones[start] - open_notes[0] > self.fret_count:
+               break
+           cells = []
+           for string_from_low, open_note in enumerate(open_notes):
+               first = start + string_from_low * count
+               frets = [tone - open_note for tone in tones[first:first + count]]
+               if (len(frets) < count or frets[0] < 0 or frets[-1] > self.fret_count
+                       or frets[-1] - frets[0] >= span):
+                   break
+               string_idx = strings[string_from_low]
+               cells.extend((string_idx, fret) for fret in frets)
+           else:
+               fretted = [fret for _, fret in cells]
+               positions.append(ScalePosition("3nps", min(fretted), max(fretted), tuple(sorted(cells)), None))
+       return positions
+
+
+@lru_cache(maxsize=32)
+def _position_index(tuning, fret_count, lowest_octave, octaves):
+   return PositionIndex(tuning, fret_count, lowest_octave, octaves)
+
+
+def get_position_index(tuning, fret_count, lowest_octave=DEFAULT_LOWEST_OCTAVE, octaves=()):
+   """Shared PositionIndex of a tuning, fret count and string octaves, cached"""
+   return _position_index(tuple(tuning), fret_count, lowest_octave, tuple(octaves))
+
+
+def find_positions(tuning, fret_count, notes, span=DEFAULT_SPAN, pattern="box", root=None,
+                   lowest_octave=DEFAULT_LOWEST_OCTAVE, octaves=()):
+   """Playable positions of a scale or note set (names or a 12-bit mask) within span frets.
+
+   root is the note the CAGED boxes are anchored on; it defaults to the first of notes.
+   lowest_octave and octaves are the board's, see open_midi_notes.
+   Raises ValueError for an unknown pattern or a CAGED search without a root.
+   """
+   if isinstance(notes, int):
+       mask = notes
+   else:
+       notes = list(notes)
+       mask = notes_to_mask(notes)
+       if root is None and notes:
+           root = notes[0]
+   if not mask or span < 1:
+       return []
+   index = get_position_index(tuning, fret_count, lowest_octave, octaves)
+   if pattern == "box":
+       return index.boxes(mask, span)
+   if pattern == "caged":
+       if root is None:
+           raise ValueError("CAGED positions need a root note")
+       return index.caged(mask, NOTE_INDEX[root], span)
+   if pattern == "3nps":
+       return index.notes_per_string(mask, span)
+   raise ValueError(f"Unknown position pattern: {pattern}")
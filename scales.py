@@ -0,0 +1,104 @@
+from collections import namedtuple
+from functools import lru_cache
+
+from fretboard_model import NOTES, notes_to_mask
+
+
+# Parent scales as semitone steps from the root, with the names of their modes in order.
+# Every mode is generated by rotating the parent scale.
+SCALE_FAMILIES = [
+   ((0, 2, 4, 5, 7, 9, 11),
+    ["Major", "Dorian", "Phrygian", "Lydian", "Mixolydian", "Minor", "Locrian"]),
+   ((0, 2, 3, 5, 7, 8, 11),
+    ["Harmonic Minor", "Locrian nat6", "Ionian #5", "Dorian #4", "Phrygian Dominant",
+     "Lydian #2", "Super Locrian bb7"]),
+   ((0, 2, 3, 5, 7, 9, 11),
+    ["Melodic Minor", "Dorian b2", "Lydian Augmented", "Lydian Dominant", "Mixolydian b6",
+     "Locrian #2", "Altered"]),
+   ((0, 2, 4, 5, 7, 8, 11),
+    ["Harmonic Major"]),
+   ((0, 1, 4, 5, 7, 8, 11),
+    ["Double Harmonic"]),
+   ((0, 2, 3, 6, 7, 8, 11),
+    ["Hungarian Minor"]),
+   ((0, 2, 4, 7, 9),
+    ["Major Pentatonic", None, None, None, "Minor Pentatonic"]),
+   ((0, 3, 5, 6, 7, 10),
+    ["Blues"]),
+   ((0, 2, 3, 4, 7, 9),
+    ["Major Blues"]),
+   ((0, 2, 4, 6, 8, 10),
+    ["Whole Tone"]),
+   ((0, 1, 3, 4, 6, 7, 9, 10),
+    ["Half-Whole Diminished", "Whole-Half Diminished"]),
+]
+
+Scale = namedtuple("Scale", ["name", "root", "family", "mask", "notes"])
+
+
+def intervals_to_mask(intervals, root):
+   mask = 0
+   for interval in intervals:
+       mask |= 1 << (root + interval) % 12
+   return mask
+
+
+def _mode_intervals(intervals, degree):
+   # Rotate the parent scale so its degree-th note becomes the root
+   start = intervals[degree]
+   return tuple(sorted((interval - start) % 12 for interval in intervals))
+
+
+def generate_scales():
+   """Every root x scale/mode as Scale tuples, ordered by family then root"""
+   scales = []
+   for intervals, mode_names in SCALE_FAMILIES:
+       for degree, family in enumerate(mode_names):
+           if family is None:
+               continue
+           mode = _mode_intervals(intervals, degree)
+           for root_idx, root in enumerate(NOTES):
+               mask = intervals_to_mask(mode, root_idx)
+               # Spell the notes starting from the root, like the old presets did
+               notes = tuple(NOTES[(root_idx + interval) % 12] for interval in mode)
+               scales.append(Scale(f"{root} {family}", root, family, mask, notes))
+   return scales
+
+
+class ScaleEngine:
+   """All generated scales with a pitch-class-set index for reverse lookups"""
+
+   def __init__(self):
+       self.scales = generate_scales()
+       self.names = [scale.name for scale in self.scales]
+       self.by_name = {scale.name: scale for scale in self.scales}
+
+       # _containing[mask] lists every scale whose notes include all of mask.
+       # Filled by walking the submasks of each scale (at most 256 per scale).
+       self._containing = {}
+       for scale in self.scales:
+           sub = scale.mask
+           while True:
+               self._containing.setdefault(sub, []).append(scale)
+               if sub == 0:
+                   break
+               sub = (sub - 1) & scale.mask
+
+   def get(self, name):
+       return self.by_name.get(name)
+
+   def scales_containing(self, notes):
+       """Scales that contain every note in notes (a note collection or 12-bit mask)"""
+       mask = notes if isinstance(notes, int) else notes_to_mask(notes)
+       return self._containing.get(mask, [])
+
+   def exact_matches(self, notes):
+       """Scales made of exactly these notes"""
+       mask = notes if isinstance(notes, int) else notes_to_mask(notes)
+       return [scale for scale in self._containing.get(mask, []) if scale.mask == mask]
+
+
+@lru_cache(maxsize=None)
+def get_scale_engine():
+   """Shared ScaleEngine, built on first use"""
+   return ScaleEngine()
@@ -0,0 +1,173 @@
+import base64
+import binascii
+import json
+import os
+import struct
+from collections import deque
+
+from fretboard_model import NOTES, NOTE_INDEX, FretboardSnapshot, mask_to_notes, notes_to_mask
+
+
+SESSION_VERSION = 1
+HISTORY_LIMIT = 500  # Undo steps kept in memory
+SAVED_HISTORY = 100  # Undo steps written to the session file
+
+# Binary snapshot: version, string count, fret count, note mask, position count,
+# then one pitch class per string and a (string, fret) byte pair per position
+_HEADER = struct.Struct("<BBBHH")
+
+
+def session_path():
+   """Where the last session is kept: $NOTEZ_SESSION or ~/.notez/session.json"""
+   return os.environ.get("NOTEZ_SESSION") or os.path.join(os.path.expanduser("~"), ".notez", "session.json")
+
+
+# --- Encoding ---
+
+def encode_snapshot(snapshot):
+   """Snapshot as a few bytes: 7 + strings + 2 * positions"""
+   positions = sorted(snapshot.highlighted_positions)
+   data = bytearray(_HEADER.pack(SESSION_VERSION, len(snapshot.tuning), snapshot.fret_count,
+                                 notes_to_mask(snapshot.highlighted_notes), len(positions)))
+   data += bytes(NOTE_INDEX[note] for note in snapshot.tuning)
+   for string_idx, fret in positions:
+       data += bytes((string_idx, fret))
+   return bytes(data)
+
+
+def decode_snapshot(data):
+   """Inverse of encode_snapshot; raises ValueError on malformed data"""
+   try:
+       version, string_count, fret_count, mask, position_count = _HEADER.unpack_from(data)
+   except struct.error as e:
+       raise ValueError(f"Truncated snapshot: {e}") from None
+   if version != SESSION_VERSION:
+       raise ValueError(f"Unsupported snapshot version {version}")
+   offset = _HEADER.size
+   if len(data) != offset + string_count + 2 * position_count:
+       raise ValueError("Snapshot length doesn't match its header")
+   pitches = data[offset:offset + string_count]
+   if any(pitch > 11 for pitch in pitches) or mask >> 12:
+       raise ValueError("Snapshot has an invalid pitch class")
+   offset += string_count
+   positions = frozenset((data[i], data[i + 1]) for i in range(offset, len(data), 2))
+   return FretboardSnapshot(tuple(NOTES[pitch] for pitch in pitches), fret_count,
+                            frozenset(mask_to_notes(mask)), positions)
+
+
+def snapshot_to_json(snapshot):
+   """Readable dict form of a snapshot, used for the current board in session files"""
+   return {
+       "tuning": list(snapshot.tuning),
+       "frets": snapshot.fret_count,
+       "notes": [note for note in NOTES if note in snapshot.highlighted_notes],
+       "positions": sorted(snapshot.highlighted_positions),
+   }
+
+
+def snapshot_from_json(data):
+   try:
+       tuning = tuple(data["tuning"])
+       fret_count = int(data["frets"])
+       notes = frozenset(data.get("notes", ()))
+       positions = frozenset((int(string_idx), int(fret)) for string_idx, fret in data.get("positions", ()))
+   except (KeyError, TypeError) as e:
+       raise ValueError(f"Malformed snapshot: {e}") from None
+   unknown = [note for note in tuning + tuple(notes) if note not in NOTE_INDEX]
+   if unknown:
+       raise ValueError(f"Unknown notes in snapshot: {', '.join(map(str, unknown))}")
+   return FretboardSnapshot(tuning, fret_count, notes, positions)
+
+
+# --- History ---
+
+def share_structure(previous, snapshot):
+   """snapshot with every field equal to previous' replaced by previous' object"""
+   if previous is None:
+       return snapshot
+   return FretboardSnapshot(*(old if old == new else new for old, new in zip(previous, snapshot)))
+
+
+class SessionHistory:
+   """Undo/redo over immutable snapshots; unchanged fields are shared between neighbours"""
+
+   def __init__(self, snapshot, limit=HISTORY_LIMIT):
+       self.current = snapshot
+       self._undo = deque(maxlen=limit)
+       self._redo = []
+
+   def record(self, snapshot):
+       """Make snapshot the current state; returns False if nothing changed"""
+       if snapshot == self.current:
+           return False
+       self._undo.append(self.current)
+       self.current = share_structure(self.current, snapshot)
+       self._redo.clear()
+       return True
+
+   def can_undo(self):
+       return bool(self._undo)
+
+   def can_redo(self):
+       return bool(self._redo)
+
+   def undo(self):
+       """Step back; returns the snapshot to restore, or None"""
+       if not self._undo:
+           return None
+       self._redo.append(self.current)
+       self.current = self._undo.pop()
+       return self.current
+
+   def redo(self):
+       if not self._redo:
+           return None
+       self._undo.append(self.current)
+       self.current = self._redo.pop()
+       return self.current
+
+
+# --- Session files ---
+
+def _encode_list(snapshots):
+   return [base64.b64encode(encode_snapshot(snapshot)).decode("ascii") for snapshot in snapshots]
+
+
+def _decode_list(items):
+   try:
+       return [decode_snapshot(base64.b64decode(item, validate=True)) for item in items]
+   except (TypeError, binascii.Error) as e:
+       raise ValueError(f"Malformed history entry: {e}") from None
+
+
+def save_session(file_name, history):
+   """Write the current board as JSON and the recent undo/redo steps as binary snapshots"""
+   os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+   data = {
+       "version": SESSION_VERSION,
+       "board": snapshot_to_json(history.current),
+       "undo": _encode_list(list(history._undo)[-SAVED_HISTORY:]),
+       "redo": _encode_list(history._redo[-SAVED_HISTORY:]),
+   }
+   # Write next to the old file and swap, so a crash can't leave half a session behind
+   temp_name = file_name + ".tmp"
+   with open(temp_name, "w", encoding="utf-8") as f:
+       json.dump(data, f, separators=(",", ":"))
+   os.replace(temp_name, file_name)
+
+
+def load_session(file_name, limit=HISTORY_LIMIT):
+   """SessionHistory saved by save_session; raises OSError or ValueError"""
+   with open(file_name, encoding="utf-8") as f:
+       data = json.load(f)
+   if not isinstance(data, dict) or data.get("version") != SESSION_VERSION:
+       raise ValueError(f"Unsupported session file: {file_name}")
+   if "board" not in data:
+       raise ValueError(f"Session file without a board: {file_name}")
+   history = SessionHistory(snapshot_from_json(data["board"]), limit)
+   previous = None
+   for snapshot in _decode_list(data.get("undo", [])):
+       previous = share_structure(previous, snapshot)
+       history._undo.append(previous)
+   history._redo = _decode_list(data.get("redo", []))
+   return history
@@ -0,0 +1,84 @@
+import struct
+
+from midi import ManualClock, PlaybackScheduler, parse_midi
+
+
+DIVISION = 480  # Ticks per quarter note
+FRAME = 1 / 60
+
+
+def _varint(value):
+   out = [value & 0x7F]
+   value >>= 7
+   while value:
+       out.append(value & 0x7F | 0x80)
+       value >>= 7
+   return bytes(reversed(out))
+
+
+def _smf(events):
+   """Format 0 file from (tick, bytes) events"""
+   track = b""
+   last = 0
+   for tick, message in sorted(events, key=lambda event: event[0]):
+       track += _varint(tick - last) + message
+       last = tick
+   track += b"\x00\xff\x2f\x00"
+   return (b"MThd" + struct.pack(">IHHH", 6, 0, 1, DIVISION)
+           + b"MTrk" + struct.pack(">I", len(track)) + track)
+
+
+def _tempo(tick, microseconds):
+   return tick, b"\xff\x51\x03" + microseconds.to_bytes(3, "big")
+
+
+def _note(tick, note, velocity=100):
+   return tick, bytes([0x90, note, velocity])
+
+
+def _song():
+   """A C major chord per quarter note; 120 bpm for two beats, then 240 bpm for 200 beats"""
+   events = [_tempo(0, 500000), _tempo(2 * DIVISION, 250000)]
+   expected = []
+   for beat in range(202):
+       tick = beat * DIVISION
+       seconds = beat * 0.5 if beat <= 2 else 1.0 + (beat - 2) * 0.25
+       note = 60 + beat % 12
+       for offset in (0, 4, 7):
+           events.append(_note(tick, note + offset))
+       events.append(_note(tick + DIVISION // 2, note, 0))
+       events.append(_note(tick + DIVISION // 2, note + 4, 0))
+       events.append(_note(tick + DIVISION // 2, note + 7, 0))
+       expected.append((seconds, note))
+   return _smf(events), expected
+
+
+def test_tempo_change_times():
+   data, expected = _song()
+   onsets = sorted({round(event.time, 9) for event in parse_midi(data) if event.velocity})
+   assert onsets == [seconds for seconds, _ in expected]
+
+
+def test_replay_one_update_per_frame_without_drift():
+   data, expected = _song()
+   clock = ManualClock()
+   updates = []
+   scheduler = PlaybackScheduler(parse_midi(data), lambda notes: updates.append((clock(), notes)), clock)
+   scheduler.start()
+   frames = 0
+   while not scheduler.finished:
+       clock.advance(FRAME)
+       before = len(updates)
+       scheduler.tick()
+       frames += 1
+       assert len(updates) - before <= 1
+   assert len(updates) <= frames
+
+   # Each chord shows up on the first frame at or after its time, however long playback ran
+   shown_at = {}
+   for time, notes in updates:
+       for seconds, root in expected:
+           if {root, root + 4, root + 7} <= notes and seconds not in shown_at and time >= seconds - 1e-9:
+               shown_at[seconds] = time
+   for seconds, _ in expected:
+       assert seconds <= shown_at[seconds] + 1e-9 < seconds + FRAME + 1e-6
@@ -0,0 +1,177 @@
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+from fretboard_model import DEFAULT_LOWEST_OCTAVE, NOTE_INDEX
+
+
+# Built-in tunings per instrument, highest string first like FretboardBase.tuning
+BUILTIN_TUNINGS = {
+   "Guitar": {
+       "Standard": ["E", "B", "G", "D", "A", "E"],
+       "Drop D": ["E", "B", "G", "D", "A", "D"],
+       "DADGAD": ["D", "A", "G", "D", "A", "D"],
+       "Open G": ["D", "B", "G", "D", "G", "D"],
+       "Open D": ["D", "A", "F#", "D", "A", "D"],
+       "Open E": ["E", "B", "G#", "E", "B", "E"],
+       "Open C": ["E", "C", "G", "C", "G", "C"],
+       "Half Step Down": ["D#", "A#", "F#", "C#", "G#", "D#"],
+       "Full Step Down": ["D", "A", "F", "C", "G", "D"],
+       "Drop C": ["D", "A", "F", "C", "G", "C"],
+   },
+   "Extended Range": {
+       "7-String Standard": ["E", "B", "G", "D", "A", "E", "B"],
+       "7-String Drop A": ["E", "B", "G", "D", "A", "E", "A"],
+       "8-String Standard": ["E", "B", "G", "D", "A", "E", "B", "F#"],
+       "8-String Drop E": ["E", "B", "G", "D", "A", "E", "B", "E"],
+       # Unison top courses, octave pairs below: the octave can't be derived, so it is spelled out
+       "12-String Standard": ["E4", "E4", "B3", "B3", "G4", "G3", "D4", "D3", "A3", "A2", "E3", "E2"],
+   },
+   "Bass": {
+       "4-String Standard": ["G", "D", "A", "E"],
+       "4-String Drop D": ["G", "D", "A", "D"],
+       "5-String Standard": ["G", "D", "A", "E", "B"],
+       "6-String Standard": ["C", "G", "D", "A", "E", "B"],
+   },
+   "Mandolin": {
+       "Standard": ["E", "A", "D", "G"],
+       "Cross A": ["E", "A", "E", "A"],
+   },
+   "Ukulele": {
+       # Re-entrant: the G and A strings sit above the C and D strings
+       "Standard": ["A4", "E4", "C4", "G4"],
+       "D Tuning": ["B4", "F#4", "D4", "A4"],
+       "Baritone": ["E", "B", "G", "D"],
+   },
+   "Banjo": {
+       # The short fifth string is a high drone
+       "Open G": ["D4", "B3", "G3", "D3", "G4"],
+       "Double C": ["D4", "C4", "G3", "C3", "G4"],
+   },
+}
+
+# Octave of the lowest string, by tuning name or instrument; anything else uses octave 2.
+# Strings spelled with an octave (e.g. "G4") use that instead
+LOWEST_OCTAVES = {
+   "Bass": 1,
+   "Mandolin": 3,
+   "Ukulele": 3,
+   "Extended Range: 7-String Standard": 1,
+   "Extended Range: 7-String Drop A": 1,
+   "Extended Range: 8-String Standard": 1,
+   "Extended Range: 8-String Drop E": 1,
+}
+
+# Flat spellings accepted in user tuning files
+FLAT_NAMES = {"Db": "C#", "Eb": "D#", "Gb": "F#", "Ab": "G#", "Bb": "A#"}
+
+# octaves holds the spelled-out octave of every string (None where it is derived), or is empty
+Tuning = namedtuple("Tuning", ["name", "instrument", "notes", "lowest_octave", "octaves"],
+                    defaults=(DEFAULT_LOWEST_OCTAVE, ()))
+
+_OCTAVE_NOTE = re.compile(r"([A-G][#b]?)(\d)?")
+
+
+def user_tunings_path():
+   """File with the user's own tunings: $NOTEZ_TUNINGS or ~/.notez/tunings.json"""
+   return os.environ.get("NOTEZ_TUNINGS") or os.path.join(os.path.expanduser("~"), ".notez", "tunings.json")
+
+
+def normalize_notes(notes):
+   """Note names as used by the fretboard (sharps), raising ValueError on unknown ones"""
+   normalized = []
+   for note in notes:
+       if isinstance(note, str):
+           note = FLAT_NAMES.get(note, note)
+       if not isinstance(note, str) or note not in NOTE_INDEX:
+           raise ValueError(f"Unknown note: {note}")
+       normalized.append(note)
+   return normalized
+
+
+def parse_notes(notes):
+   """Note names and octaves of tuning entries such as "E" or "G4", raising ValueError on unknown ones.
+
+   The octaves are None for entries without one, and empty when no entry has one.
+   """
+   names, octaves = [], []
+   for note in notes:
+       match = _OCTAVE_NOTE.fullmatch(note) if isinstance(note, str) else None
+       if match is None:
+           raise ValueError(f"Unknown note: {note}")
+       names.append(match.group(1))
+       octaves.append(int(match.group(2)) if match.group(2) else None)
+   if all(octave is None for octave in octaves):
+       octaves = []
+   return normalize_notes(names), octaves
+
+
+class TuningLibrary:
+   """Built-in tunings plus the ones from the user's tunings file"""
+
+   def __init__(self, user_file=None):
+       self.tunings = []
+       self.by_name = {}
+       self.add_tunings(BUILTIN_TUNINGS)
+       if user_file and os.path.exists(user_file):
+           self.load(user_file)
+
+   def add_tunings(self, instruments):
+       """Add {"Instrument": {"Name": [notes, highest string first]}}; later names replace earlier ones"""
+       for instrument, tunings in instruments.items():
+           if not isinstance(tunings, dict):
+               raise ValueError(f"Tunings of {instrument} should map names to notes")
+           for name, notes in tunings.items():
+               full_name = f"{instrument}: {name}"
+               if not isinstance(notes, list) or not notes:
+                   raise ValueError(f"Tuning {full_name} should be a list of notes")
+               lowest_octave = LOWEST_OCTAVES.get(full_name, LOWEST_OCTAVES.get(instrument, DEFAULT_LOWEST_OCTAVE))
+               try:
+                   notes, octaves = parse_notes(notes)
+               except ValueError as e:
+                   raise ValueError(f"Tuning {full_name}: {e}") from None
+               tuning = Tuning(full_name, instrument, tuple(notes), lowest_octave, tuple(octaves))
+               if tuning.name in self.by_name:
+                   self.tunings.remove(self.by_name[tuning.name])
+               self.tunings.append(tuning)
+               self.by_name[tuning.name] = tuning
+
+   def load(self, user_file):
+       """Add the tunings of a JSON file shaped like BUILTIN_TUNINGS"""
+       with open(user_file, encoding="utf-8") as f:
+           instruments = json.load(f)
+       if not isinstance(instruments, dict):
+           raise ValueError(f"{user_file} should map instruments to their tunings")
+       self.add_tunings(instruments)
+
+   @property
+   def names(self):
+       return [tuning.name for tuning in self.tunings]
+
+   def get(self, name):
+       return self.by_name.get(name)
+
+   def instruments(self):
+       """Instrument names in the order they were added"""
+       return list(dict.fromkeys(tuning.instrument for tuning in self.tunings))
+
+   def for_instrument(self, instrument):
+       return [tuning for tuning in self.tunings if tuning.instrument == instrument]
+
+   def find(self, notes):
+       """Library tuning with exactly these notes, or None"""
+       notes = tuple(notes)
+       return next((tuning for tuning in self.tunings if tuning.notes == notes), None)
+
+
+@lru_cache(maxsize=None)
+def get_tuning_library():
+   """Shared TuningLibrary, built on first use; a broken user file is reported and skipped"""
+   try:
+       return TuningLibrary(user_tunings_path())
+   except (OSError, ValueError) as e:
+       print(f"warning: could not load user tunings: {e}", file=sys.stderr)
+       return TuningLibrary()